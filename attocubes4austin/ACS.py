@@ -9,6 +9,15 @@ class AttoException(Exception):
         self.errorText = errorText
 
 
+class RequestPending(Exception):
+    """ Raised from a replayed function that needs a response it was not
+    given. Carries the request the function tried to send.
+    """
+    def __init__(self, method, params=False):
+        self.method = method
+        self.params = params
+
+
 class Device(object):
     TCP_PORT   = 9090
     is_open    = False
@@ -17,6 +26,7 @@ class Device(object):
     def __init__(self, address):
         self.address  = address
         self.language = 0
+        self.pendingResponses = {}
 
     def __del__(self):
         self.close()
@@ -48,8 +58,9 @@ class Device(object):
             self.bufferedSocket.close()
             self.tcp.close()
             self.is_open = False
+            self.pendingResponses = {}
 
-    def sendRequest(self, method, params=False):
+    def buildRequest(self, method, params=False):
         req = {
                 "jsonrpc": "2.0",
                 "method": method,
@@ -57,21 +68,146 @@ class Device(object):
                 }
         if params:
             req["params"] = params
+        self.request_id = self.request_id + 1
+        return req
+
+    def sendRequest(self, method, params=False):
+        req = self.buildRequest(method, params)
         self.bufferedSocket.write(json.dumps(req))
         self.bufferedSocket.flush()
-        self.request_id = self.request_id + 1
+        return req["id"]
+
+    def sendRequests(self, requests):
+        """ Writes several requests back to back and flushes them once,
+        without waiting for any of the replies.
+
+        Parameters
+        ----------
+        requests : list
+            (method, params) tuples, params may be omitted
+
+        Returns
+        -------
+        ids : list
+            JSON-RPC ids of the requests, to be passed to getResponses()
+        """
+        reqs = [self.buildRequest(*request) for request in requests]
+        for req in reqs:
+            self.bufferedSocket.write(json.dumps(req))
+        self.bufferedSocket.flush()
+        return [req["id"] for req in reqs]
+
+    def getResponse(self, request_id=None):
+        """ Reads the next response from the device. If request_id is given,
+        replies to other pipelined requests are put aside until the matching
+        one arrives. An error reply without an id, which the device sends
+        when it cannot parse a request, raises AttoException, as it cannot
+        be matched to any request.
+        """
+        if request_id is None:
+            response = self.bufferedSocket.readline()
+            return json.loads(response)
+        if request_id in self.pendingResponses:
+            return self.pendingResponses.pop(request_id)
+        while True:
+            response = json.loads(self.bufferedSocket.readline())
+            if response.get('id') == request_id:
+                return response
+            if response.get('id') is None:
+                raise AttoException("JSON error in %s" % response.get('error'))
+            self.pendingResponses[response.get('id')] = response
 
-    def getResponse(self):
-        response = self.bufferedSocket.readline()
-        return json.loads(response)
+    def getResponses(self, ids):
+        """ Collects the responses of requests sent with sendRequests(),
+        matched by their JSON-RPC id and returned in the order of ids.
+        """
+        return [self.getResponse(request_id) for request_id in ids]
 
     def request(self,method,params=False):
         """ Synchronous request.
         """
         if not self.is_open:
             raise AttoException("not connected, use connect()");
-        self.sendRequest(method, params)
-        return self.getResponse()
+        return self.getResponse(self.sendRequest(method, params))
+
+    def pipelinedRequest(self, requests):
+        """ Pipelined request: all requests are in flight at the same time,
+        so the whole list costs a single network round trip.
+
+        Parameters
+        ----------
+        requests : list
+            (method, params) tuples, params may be omitted
+
+        Returns
+        -------
+        responses : list
+            responses in the order of requests
+        """
+        if not self.is_open:
+            raise AttoException("not connected, use connect()");
+        return self.getResponses(self.sendRequests(requests))
+
+    def batchRequest(self, requests):
+        """ Batch request: sends all requests as one JSON-RPC 2.0 batch array
+        in a single write and reads the reply array.
+
+        Parameters
+        ----------
+        requests : list
+            (method, params) tuples, params may be omitted
+
+        Returns
+        -------
+        responses : list
+            responses in the order of requests
+        """
+        if not self.is_open:
+            raise AttoException("not connected, use connect()");
+        reqs = [self.buildRequest(*request) for request in requests]
+        self.bufferedSocket.write(json.dumps(reqs))
+        self.bufferedSocket.flush()
+        while True:
+            replies = json.loads(self.bufferedSocket.readline())
+            if isinstance(replies, list):
+                break
+            if replies.get('id') is None:
+                raise AttoException("JSON error in %s" % replies.get('error'))
+            # reply to a pipelined request that is still outstanding
+            self.pendingResponses[replies['id']] = replies
+        byId = dict((reply.get('id'), reply) for reply in replies)
+        missing = [req["method"] for req in reqs if req["id"] not in byId]
+        if missing:
+            raise AttoException("No reply to " + ", ".join(missing) + " in the batch")
+        return [byId[req["id"]] for req in reqs]
+
+    def replay(self, function, args, responses):
+        """ Runs a driver function of this class with request() answered from
+        the given responses instead of the connection. Raises RequestPending
+        with the next request once the responses are used up, which is how
+        the request a function sends is found without sending it.
+
+        Parameters
+        ----------
+        function : function
+            unbound driver function, e.g. IDS.Device.getAxisDisplacement
+        args : tuple
+            arguments of the function
+        responses : list
+            responses handed out to the function's request() calls in order
+        """
+        shadow = self.__class__.__new__(self.__class__)
+        shadow.address  = self.address
+        shadow.language = self.language
+        queue = list(responses)
+
+        def request(method, params=False):
+            if not queue:
+                raise RequestPending(method, params)
+            return queue.pop(0)
+
+        shadow.request = request
+        return function(shadow, *args)
 
     def handleError(self, response, ignoreFunctionError=True):
         if response.get('error', False):
@@ -0,0 +1,564 @@
+# -*- coding: utf-8 -*-
+"""
+Shared acquisition helpers for the AttoCube readout scripts.
+
+All axes of an IDS are read with a single getAxesDisplacement request, and
+the requests to all devices are sent before any reply is read, so one sample
+of both AttoCubes costs one network round trip.
+
+-SymbolBlock reads a fixed list of PLC symbols with one ADS sum read whose
+layout is worked out once, and decodes the reply with a NumPy dtype.
+-PlcNotifications has the PLC push those symbols every task cycle with ADS
+device notifications instead of being polled.
+-SampleDrain reads the PLC's own sample buffer (MAIN.fbSampleBuf), one
+record per PLC cycle, half a buffer at a time, so every 1 ms cycle is kept
+no matter how fast Python polls.
+-Producer threads poll one source (the PLC symbol block or one IDS) as fast
+as it answers into a timestamped RingBuffer, and a Merger aligns the IDS
+streams to the PLC samples, so the slowest source no longer sets the rate
+of the others.
+"""
+
+import ctypes
+from datetime import datetime
+import os
+import threading
+from time import monotonic, perf_counter_ns, sleep
+import numpy as np
+import pyads
+from IDS import Device
+
+# Number of measurement axes of an IDS3010
+AXES = 3
+
+# NumPy types of the elementary PLC types, little endian as on the PLC
+PLC_DTYPES = {'BOOL': '?', 'BYTE': 'u1', 'USINT': 'u1', 'SINT': 'i1',
+              'WORD': '<u2', 'UINT': '<u2', 'INT': '<i2',
+              'DWORD': '<u4', 'UDINT': '<u4', 'DINT': '<i4', 'TIME': '<u4',
+              'LWORD': '<u8', 'ULINT': '<u8', 'LINT': '<i8',
+              'REAL': '<f4', 'LREAL': '<f8'}
+
+# Layout of the PLC's ST_Sample (pack_mode 1), keep in sync with DUTs\ST_Sample.TcDUT
+ST_SAMPLE = np.dtype([('nCycle', '<u4'),
+                      ('ActEncCount', '<u8'),
+                      ('engActEnc', '<f8'),
+                      ('MirEncCount', '<u8'),
+                      ('engMirEnc', '<f8'),
+                      ('LC_InR', '<f4'),
+                      ('mtr_pos', '<i4'),
+                      ('mtrRPM', '<f8'),
+                      ('mtrCurrent', '<f4'),
+                      ('fSetpointValue', '<f4'),
+                      ('rb_x', '<f4'),
+                      ('sp_x', '<f4'),
+                      ('sTime', 'S16')])
+
+# PLC symbols the displacements of 206 and 207 are handed over to, in the order of readDisplacements()
+ATTO_SYMBOLS = ['MAIN.atto1', 'MAIN.atto2', 'MAIN.atto3', 'MAIN.atto4', 'MAIN.atto5', 'MAIN.atto6']
+
+# Folder the readout scripts save their runs in
+RESULTS_PATH = '\\AttoCube_Results'
+
+#-----------------------------------------------------------------------------------------------#
+
+def connectIDS(address, name):
+    """ Connects to the IDS at address and prints its identity to the console.
+
+    Parameters
+    ----------
+    address : str
+        IP address of the IDS
+    name : str
+        name used in the console output, e.g. '206'
+
+    Returns
+    -------
+    dev : IDS.Device
+        connected device
+    """
+    print("Connecting to AttoCubube " + name + "...")
+    dev = Device(address)
+    dev.connect()
+
+    print(dev.getFeatureName(1)) #OK
+    print(dev.getSerialNumber()) #OK
+    print(dev.getFpgaVersion()) #OK
+    print(dev.getMacAddress()) #OK
+    print(dev.getDeviceType()) #OK
+    print(dev.getDeviceName()) #OK
+    print("#" + name + " CONNECTED \n")
+    return dev
+
+def resultsFileName(plc, pathName=RESULTS_PATH):
+    """ Timestamped CSV of a new run of the hardpoint selected on the test
+    stand, e.g. '\\AttoCube_Results\\HPT1-20240101_12h00m.csv'.
+
+    Returns
+    -------
+    hardpoint : str
+        MAIN.sSelHPT
+    fullFileName : str
+    """
+    hardpoint = plc.read_by_name("MAIN.sSelHPT", pyads.PLCTYPE_STRING)
+    fileNameTS = hardpoint + "-" + datetime.now().strftime("%Y%m%d_%Hh%Mm")
+    return hardpoint, os.path.join(pathName, fileNameTS + ".csv")
+
+def readDisplacements(devices, timer=None, stages=None):
+    """ Reads all axes of every device.
+
+    Parameters
+    ----------
+    devices : list
+        connected IDS.Device instances
+    timer : Timing.StageTimer
+        times the request of each device, from sending all requests to its
+        reply
+    stages : list
+        stage name of every device in timer
+
+    Returns
+    -------
+    displacements : numpy.ndarray
+        int64 array of length 3 * len(devices) in pm, axes of the first
+        device first
+    """
+    start = perf_counter_ns()
+    ids = [dev.sendAxesDisplacementRequest() for dev in devices]
+    displacements = np.empty(AXES * len(devices), dtype=np.int64)
+    for i, (dev, request_id) in enumerate(zip(devices, ids)):
+        displacements[AXES * i:AXES * (i + 1)] = dev.readAxesDisplacement(request_id)
+        if timer is not None:
+            timer.record(stages[i], start)
+    return displacements
+
+def writeDisplacements(plc, displacements):
+    """ Hands the displacements over to MAIN.atto1..6 with one ADS sum write
+    instead of one write_by_name per symbol.
+
+    Parameters
+    ----------
+    plc : pyads.Connection
+        open connection to the PLC
+    displacements : sequence
+        displacements of 206 and 207 in pm, as returned by readDisplacements()
+    """
+    plc.write_list_by_name(dict(zip(ATTO_SYMBOLS, [float(d) for d in displacements])))
+
+def plcDtype(symbol_type):
+    """ NumPy dtype of an elementary PLC type such as 'LREAL' or 'STRING(80)'. """
+    if symbol_type.startswith('STRING'):
+        # STRING(n) takes n characters plus the terminating NUL, STRING alone is STRING(80)
+        length = int(symbol_type[7:-1]) if '(' in symbol_type else 80
+        return np.dtype('S%d' % (length + 1))
+    return np.dtype(PLC_DTYPES[symbol_type])
+
+def lookupSymbols(plc, names):
+    """ Looks up PLC symbols and the record dtype that holds one value of each.
+
+    Returns
+    -------
+    symbols : list
+        pyads.AdsSymbol of each name
+    dtype : numpy.dtype
+        packed record with one field per name
+    """
+    symbols = [plc.get_symbol(name) for name in names]
+    return symbols, np.dtype([(name, plcDtype(symbol.symbol_type)) for name, symbol in zip(names, symbols)])
+
+class SymbolBlock(object):
+    """ Block read of a fixed list of PLC symbols. The symbols are looked up
+    once; every read() is then a single ADS sum read (ADSIGRP_SUMUP_READ) of
+    a prebuilt request, and the reply is decoded with a NumPy dtype instead
+    of resolving each name and building a dict per sample.
+
+    Parameters
+    ----------
+    plc : pyads.Connection
+        open connection to the PLC
+    names : list
+        symbol names, e.g. the scripts' var_list
+    """
+
+    def __init__(self, plc, names):
+        self.plc = plc
+        self.names = list(names)
+        symbols, self.dtype = lookupSymbols(plc, self.names)
+        # pyads sizes the reply of a sum read from the request entries, so they are passed as SAdsSumRequest
+        self.requestType = pyads.structs.SAdsSumRequest * len(self.names)
+        self.request = self.requestType(*[(symbol.index_group, symbol.index_offset, self.dtype[name].itemsize)
+                                          for name, symbol in zip(self.names, symbols)])
+        # The reply holds one error code per symbol followed by the values in request order
+        self.errorBytes = 4 * len(self.names)
+        self.replyType = ctypes.c_ubyte * (self.errorBytes + self.dtype.itemsize)
+
+    def read(self):
+        """ Reads all symbols.
+
+        Returns
+        -------
+        symbols : numpy.void
+            record indexed by symbol name like the read_list_by_name dict;
+            STRING symbols are returned as bytes
+        """
+        reply = self.plc.read_write(pyads.constants.ADSIGRP_SUMUP_READ, len(self.names), self.replyType,
+                                    self.request, self.requestType, return_ctypes=True)
+        errors = np.frombuffer(reply, dtype='<u4', count=len(self.names))
+        if errors.any():
+            raise pyads.ADSError(err_code=int(errors[errors.nonzero()[0][0]]))
+        return np.frombuffer(reply, dtype=self.dtype, count=1, offset=self.errorBytes)[0]
+
+class PlcNotifications(object):
+    """ PLC samples pushed by ADS device notifications instead of polling.
+    Every symbol gets one notification; the PLC stamps each value with the
+    time of the task cycle it was sampled in. Values with the same stamp make
+    up one sample, which is appended to buffer as soon as a newer stamp
+    arrives, with the latest value of symbols that did not change.
+
+    Parameters
+    ----------
+    plc : pyads.Connection
+        open connection to the PLC
+    names : list
+        symbol names, e.g. the scripts' var_list
+    buffer : RingBuffer
+        where the samples go, as records indexed by symbol name
+    cycleTime : float
+        sampling period in ms for cyclic transmission
+    onChange : bool
+        only transmit values that changed instead of every cycle
+    maxDelay : float
+        ms the PLC may collect samples before sending them in one frame
+    """
+
+    def __init__(self, plc, names, buffer, cycleTime=1, onChange=False, maxDelay=10):
+        self.plc = plc
+        self.names = list(names)
+        self.buffer = buffer
+        self.cycleTime = cycleTime
+        self.onChange = onChange
+        self.maxDelay = maxDelay
+        self.symbols, self.dtype = lookupSymbols(plc, self.names)
+        self.current = np.zeros(1, dtype=self.dtype)[0]
+        self.seen = set()
+        self.stamp = None
+        # Smallest seen difference between arrival (monotonic) and PLC time, maps PLC stamps onto time.monotonic()
+        self.offset = np.inf
+        self.appended = -np.inf
+        self.handles = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        mode = pyads.ADSTRANS_SERVERONCHA if self.onChange else pyads.ADSTRANS_SERVERCYCLE
+        for name in self.names:
+            attr = pyads.NotificationAttrib(self.dtype[name].itemsize, trans_mode=mode,
+                                            max_delay=self.maxDelay, cycle_time=self.cycleTime)
+            self.handles.append(self.plc.add_device_notification(name, attr, self.callback))
+
+    def stop(self):
+        for notification, user in self.handles:
+            self.plc.del_device_notification(notification, user)
+        self.handles = []
+
+    def callback(self, notification, name):
+        contents = notification.contents
+        value = ctypes.string_at(ctypes.addressof(contents) + type(contents).data.offset, contents.cbSampleSize)
+        # nTimeStamp is a Windows FILETIME in 100 ns
+        stamp = contents.nTimeStamp * 1e-7
+        with self.lock:
+            self.offset = min(self.offset, monotonic() - stamp)
+            if self.stamp is not None and stamp > self.stamp and len(self.seen) == len(self.names):
+                # The offset only shrinks, keep the sample times increasing anyway
+                self.appended = max(self.appended, self.stamp + self.offset)
+                self.buffer.append(self.appended, self.current.copy())
+            if self.stamp is None or stamp > self.stamp:
+                self.stamp = stamp
+            self.current[name] = np.frombuffer(value, dtype=self.dtype[name])[0]
+            self.seen.add(name)
+
+class SampleDrain(threading.Thread):
+    """ Drains the PLC's double buffered ST_Sample array (FB_SampleBuffer).
+    The PLC fills one half every cycle while the other half is read here in a
+    single ADS read and decoded with ST_SAMPLE without copying. The last
+    partial half is read by stop(), once the PLC has stopped recording.
+
+    Only the most recently completed half is guaranteed to be intact, so
+    halves that completed in between are counted in lost, as is a half the
+    PLC started to overwrite during the read. The PLC counts the same
+    overruns in nOverruns.
+
+    Parameters
+    ----------
+    plc : pyads.Connection
+        open connection to the PLC
+    write : callable
+        called with every drained numpy.ndarray of ST_SAMPLE records
+    name : str
+        instance path of the FB_SampleBuffer
+    period : float
+        seconds between polls, must stay well below the PLC time of one half
+    """
+
+    def __init__(self, plc, write, name='MAIN.fbSampleBuf', period=0.1):
+        threading.Thread.__init__(self, daemon=True)
+        self.plc = plc
+        self.write = write
+        self.name = name
+        self.period = period
+        self.halfSize = plc.read_by_name(name + '.nHalfSize', pyads.PLCTYPE_UDINT)
+        self.halfType = ctypes.c_ubyte * (self.halfSize * ST_SAMPLE.itemsize)
+        self.halvesRead = 0
+        self.lost = 0
+        self.samples = 0
+        self.running = False
+        self.error = None
+
+    def halfName(self, half):
+        # Half number k is written to aHalfA when k is even
+        return self.name + ('.aHalfB' if half % 2 else '.aHalfA')
+
+    def readHalf(self, half, count):
+        data = self.plc.read_by_name(self.halfName(half), self.halfType, return_ctypes=True)
+        return np.frombuffer(data, dtype=ST_SAMPLE, count=count)
+
+    def poll(self):
+        """ Reads the newest completed half if there is one.
+
+        Returns
+        -------
+        count : int
+            number of samples handed to write
+        """
+        done = self.plc.read_by_name(self.name + '.nHalvesDone', pyads.PLCTYPE_UDINT)
+        if done <= self.halvesRead:
+            return 0
+        self.lost += (done - self.halvesRead - 1) * self.halfSize
+        samples = self.readHalf(done - 1, self.halfSize)
+        # The PLC reuses the buffer of half done - 1 once half done is complete
+        if self.plc.read_by_name(self.name + '.nHalvesDone', pyads.PLCTYPE_UDINT) > done:
+            self.lost += self.halfSize
+            samples = samples[:0]
+        self.halvesRead = done
+        self.plc.write_by_name(self.name + '.nHalvesRead', done, pyads.PLCTYPE_UDINT)
+        if len(samples):
+            self.write(samples)
+        self.samples += len(samples)
+        return len(samples)
+
+    def start(self):
+        self.running = True
+        threading.Thread.start(self)
+
+    def stop(self):
+        """ Stops polling and reads what is left in the buffer. Call it after
+        the PLC stopped recording (MAIN.PyLoadBusy fell), otherwise the last
+        partial half may still be growing.
+        """
+        self.running = False
+        self.join()
+        if self.error is not None:
+            return
+        self.poll()
+        done = self.plc.read_by_name(self.name + '.nHalvesDone', pyads.PLCTYPE_UDINT)
+        count = self.plc.read_by_name(self.name + '.nIndex', pyads.PLCTYPE_UDINT)
+        if done == self.halvesRead and count:
+            samples = self.readHalf(done, count)
+            self.write(samples)
+            self.samples += len(samples)
+
+    def run(self):
+        try:
+            while self.running:
+                sleep(self.period)
+                self.poll()
+        except Exception as e:
+            self.error = e
+            self.running = False
+
+#-----------------------------------------------------------------------------------------------#
+
+class RingBuffer(object):
+    """ Fixed-size buffer of timestamped samples, written by one Producer and
+    read by the merge stage. Samples are numbered in the order they were
+    appended; once the buffer is full the oldest are overwritten.
+
+    Parameters
+    ----------
+    capacity : int
+        number of samples kept
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = [None] * capacity
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, t, value):
+        with self.lock:
+            i = self.count % self.capacity
+            self.times[i] = t
+            self.values[i] = value
+            self.count += 1
+
+    def latest(self):
+        """ Returns (t, value) of the newest sample or None if empty. """
+        with self.lock:
+            if self.count == 0:
+                return None
+            i = (self.count - 1) % self.capacity
+            return self.times[i], self.values[i]
+
+    def read(self, start=0):
+        """ Returns the samples numbered start and up that are still in the
+        buffer.
+
+        Returns
+        -------
+        times : numpy.ndarray
+            time.monotonic() of each sample in s
+        values : list
+            the samples
+        end : int
+            number of the next sample, to be passed as start of the next call
+        """
+        with self.lock:
+            end = self.count
+            start = max(start, end - self.capacity)
+            idx = np.arange(start, end) % self.capacity
+            return self.times[idx], [self.values[i] for i in idx], end
+
+class Producer(threading.Thread):
+    """ Thread that calls read() as fast as it returns and appends each result
+    to buffer, stamped with the middle of the call. An exception stops the
+    thread and is kept in error.
+
+    Parameters
+    ----------
+    read : callable
+        returns one sample, e.g. dev206.getAxesDisplacement
+    buffer : RingBuffer
+        where the samples go
+    """
+
+    def __init__(self, read, buffer):
+        threading.Thread.__init__(self, daemon=True)
+        self.readSample = read
+        self.buffer = buffer
+        self.running = False
+        self.error = None
+
+    def start(self):
+        self.running = True
+        threading.Thread.start(self)
+
+    def stop(self):
+        self.running = False
+        self.join()
+
+    def run(self):
+        try:
+            while self.running:
+                t = monotonic()
+                value = self.readSample()
+                self.buffer.append((t + monotonic()) / 2, value)
+        except Exception as e:
+            self.error = e
+            self.running = False
+
+def interpolate(times, values, at):
+    """ Linear interpolation of a sampled stream, held constant outside the
+    sampled range.
+
+    Parameters
+    ----------
+    times : numpy.ndarray
+        increasing sample times, shape (n,)
+    values : numpy.ndarray
+        samples, shape (n, width)
+    at : numpy.ndarray
+        times to interpolate at, shape (m,)
+
+    Returns
+    -------
+    result : numpy.ndarray
+        shape (m, width)
+    """
+    i = np.clip(np.searchsorted(times, at), 1, len(times) - 1)
+    t0 = times[i - 1]
+    t1 = times[i]
+    w = np.clip((at - t0) / np.where(t1 > t0, t1 - t0, 1.0), 0.0, 1.0)[:, None]
+    return values[i - 1] * (1.0 - w) + values[i] * w
+
+class Merger(object):
+    """ Merge stage: aligns IDS streams to the samples of the PLC stream.
+    Every PLC sample becomes one merged sample, with each IDS stream linearly
+    interpolated to the PLC sample's timestamp. PLC samples newer than the
+    newest sample of any IDS stream are held back until that stream catches
+    up, and those older than the first sample of any IDS stream are dropped
+    and counted in dropped, so nothing is extrapolated.
+
+    Parameters
+    ----------
+    master : RingBuffer
+        PLC samples (SymbolBlock records or read_list_by_name dicts)
+    streams : list
+        RingBuffers of IDS samples (displacement tuples in pm)
+    """
+
+    def __init__(self, master, streams):
+        self.master = master
+        self.streams = streams
+        self.next = 0
+        self.dropped = 0
+        # Keep enough IDS history to bracket held-back PLC samples
+        self.history = [(np.zeros(0), np.zeros((0, AXES)), 0) for stream in streams]
+
+    def merge(self):
+        """ Returns the merged samples that became available since the last
+        call.
+
+        Returns
+        -------
+        times : numpy.ndarray
+            time.monotonic() of the PLC samples in s
+        symbols : list
+            the PLC samples
+        displacements : numpy.ndarray
+            int64 array of shape (n, 3 * len(streams)) in pm
+        nearest : numpy.ndarray
+            time.monotonic() of the IDS sample closest to each PLC sample,
+            shape (n, len(streams)), to judge the alignment
+        """
+        for k, stream in enumerate(self.streams):
+            times, values, end = self.history[k]
+            newTimes, newValues, end = stream.read(end)
+            if len(newTimes):
+                times = np.concatenate((times, newTimes))[-stream.capacity:]
+                values = np.concatenate((values, np.asarray(newValues, dtype=np.float64)))[-stream.capacity:]
+            self.history[k] = (times, values, end)
+
+        masterTimes, symbols, end = self.master.read(self.next)
+        if any(len(times) == 0 for times, values, end in self.history):
+            return masterTimes[:0], [], np.zeros((0, AXES * len(self.streams)), dtype=np.int64), np.zeros((0, len(self.streams)))
+        ready = int(np.searchsorted(masterTimes, min(times[-1] for times, values, end in self.history), side='right'))
+        self.next = end - len(symbols) + ready
+        # Only PLC samples from before the IDS streams started can be older than their history
+        early = min(ready, int(np.searchsorted(masterTimes, max(times[0] for times, values, end in self.history))))
+        self.dropped += early
+        masterTimes = masterTimes[early:ready]
+        symbols = symbols[early:ready]
+        ready -= early
+
+        displacements = np.empty((ready, AXES * len(self.streams)), dtype=np.int64)
+        nearest = np.empty((ready, len(self.streams)))
+        for k, (times, values, end) in enumerate(self.history):
+            if ready:
+                displacements[:, AXES * k:AXES * (k + 1)] = np.rint(interpolate(times, values, masterTimes))
+                i = np.clip(np.searchsorted(times, masterTimes), 1, len(times) - 1)
+                closer = np.abs(times[i] - masterTimes) < np.abs(times[i - 1] - masterTimes)
+                nearest[:, k] = np.where(closer, times[i], times[i - 1])
+            # Drop IDS history that can no longer bracket a pending PLC sample
+            keep = max(0, int(np.searchsorted(times, masterTimes[-1] if ready else -np.inf)) - 1)
+            self.history[k] = (times[keep:], values[keep:], end)
+        return masterTimes, symbols, displacements, nearest
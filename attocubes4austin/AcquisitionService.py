@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Long-running acquisition service for the test stand, instead of the PLC
+launching AttoCube_LC_Readout.py or AttoCube_LC_Readout_Stiff.py with
+NT_StartProcess for every test. Each launch imported pandas, matplotlib,
+NumPy and pyads, connected to both IDS and queried their identities before
+the first sample, and the start of the test was lost meanwhile.
+
+The service does all of that once and keeps it: the ADS route, the symbol
+lookups, the PLC symbol block of the stiffness readout streaming by ADS
+notification into a ring buffer, and both IDS polled without a break by
+their producers into ring buffers of their own. An on-change notification
+of MAIN.PyLoadBusy arms a run on its rising edge. The stiffness run takes
+the streamed PLC samples from the first cycle of the test on, as long as
+that is within the last LOOKBACK samples when the run starts, and the IDS
+samples around them were already taken, so its recording starts with the
+cycle of the edge. The LC readout polls the PLC and the IDS itself, with
+the producers paused, and starts with the cycle it is armed in. Which
+readout runs follows the test toggles as in MAIN:
+-tglSAstiffness/tglPyTest: the stiffness readout (FB_PyListenerStiffness)
+-the other tests: the LC readout (FB_PyListener)
+-btnPyPosRep alone: nothing, the position repeatability script has its own
+launcher.
+The CSV export, the report and the plots of a run are made on a worker
+thread while the service waits for the next test.
+
+The service counts MAIN.PyHeartbeat up every HEARTBEAT_PERIOD, and the PLC
+listeners only launch it when that count has stopped, e.g. after a reboot;
+a service started during a test records it at once. A second instance exits
+straight away, as it cannot bind SERVICE_PORT. While idle, the IDS whose
+producer failed are reconnected every KEEPALIVE_PERIOD, and both are
+reconnected after a run that failed.
+
+Usage
+-----
+    python AcquisitionService.py [--ams 10.10.160.129.1.1] [--port 851]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import ctypes
+import os
+import socket
+import threading
+from sys import exit
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pyads
+from Acquisition import connectIDS, SymbolBlock, PlcNotifications, RingBuffer, Producer, RESULTS_PATH
+import AttoCube_LC_Readout
+import AttoCube_LC_Readout_Stiff
+
+AMS_NET_ID = '10.10.160.129.1.1'
+AMS_PORT = 851
+
+# Address and console name of IDS 206 and 207
+IDS_ADDRESSES = [('192.168.88.206', '206'), ('192.168.88.207', '207')]
+
+# Local TCP port held while the service runs, so only one instance runs at a time
+SERVICE_PORT = 48851
+
+# Seconds between two counts of MAIN.PyHeartbeat
+HEARTBEAT_PERIOD = 1.0
+
+# Seconds between two checks of the idle IDS
+KEEPALIVE_PERIOD = 10.0
+
+# Streamed samples searched back for the start of a test when a run is armed
+LOOKBACK = 1000
+
+# Toggles of the tests recorded by each readout, as in MAIN
+STIFF_TOGGLES = ['MAIN.tglSAstiffness', 'MAIN.tglPyTest']
+LC_TOGGLES = ['MAIN.tglStiffness', 'MAIN.tglBWY', 'MAIN.tglROM', 'MAIN.tglSine', 'MAIN.tglPLoop']
+
+def claimInstance(port=SERVICE_PORT):
+    """ Socket bound to a local port for as long as the service runs, None
+    if another instance holds it.
+    """
+    guard = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        guard.bind(('127.0.0.1', port))
+    except OSError:
+        guard.close()
+        return None
+    return guard
+
+class Service(object):
+    """ Warm acquisition service.
+
+    Parameters
+    ----------
+    amsNetId : str
+        AMS Net ID of the test stand PLC
+    port : int
+        AMS port of the PLC runtime
+    ip : str
+        IP address of the PLC, None to derive it from amsNetId
+    idsAddresses : list
+        (address, name) of IDS 206 and 207
+    """
+
+    def __init__(self, amsNetId=AMS_NET_ID, port=AMS_PORT, ip=None, idsAddresses=IDS_ADDRESSES):
+        self.amsNetId = amsNetId
+        self.port = port
+        self.ip = ip
+        self.idsAddresses = idsAddresses
+        self.devices = []
+        self.serials = []
+        self.producers = []
+        self.connections = []
+        self.busy = False
+        self.armed = threading.Event()
+        self.stopping = threading.Event()
+        self.heartbeat = None
+        self.busyHandle = None
+        # One run is post-processed at a time, in the order of the runs
+        self.post = ThreadPoolExecutor(1)
+
+    def openPlc(self):
+        plc = pyads.Connection(self.amsNetId, self.port, self.ip)
+        plc.open()
+        self.connections.append(plc)
+        return plc
+
+    def start(self):
+        """ Connects to everything, starts the PLC stream and the heartbeat and
+        arms at once if a test is already running.
+        """
+        for address, name in self.idsAddresses:
+            self.connectDevice(address, name)
+        pyads.constants.ADSTRANS_SERVERCYCLE = 3
+        self.plc = self.openPlc()
+        # SampleDrain and the heartbeat talk to the PLC concurrently with the readout loop, each on its own
+        # connection since pyads on Linux handles one request at a time per connection
+        self.drainPlc = self.openPlc()
+        self.heartbeatPlc = self.openPlc()
+        print("CONNECTED TO HARDPOINT TESTSTAND")
+
+        self.plcBlock = SymbolBlock(self.plc, AttoCube_LC_Readout.var_list)
+        self.toggles = SymbolBlock(self.plc, STIFF_TOGGLES + LC_TOGGLES)
+        self.plcStream = PlcNotifications(self.plc, AttoCube_LC_Readout_Stiff.var_list, RingBuffer())
+        self.plcStream.start()
+        attr = pyads.NotificationAttrib(1, trans_mode=pyads.ADSTRANS_SERVERONCHA, max_delay=0, cycle_time=1)
+        self.busyHandle = self.plc.add_device_notification('MAIN.PyLoadBusy', attr, self.busyChanged)
+        if self.plc.read_by_name('MAIN.PyLoadBusy', pyads.PLCTYPE_BOOL):
+            self.busy = True
+            self.armed.set()
+
+        self.heartbeat = threading.Thread(target=self.beat, daemon=True)
+        self.heartbeat.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.heartbeat is not None:
+            self.heartbeat.join()
+        if self.busyHandle is not None:
+            self.plc.del_device_notification(*self.busyHandle)
+            self.busyHandle = None
+            self.plcStream.stop()
+        self.post.shutdown()
+        self.stopProducers()
+        for connection in self.connections + self.devices:
+            connection.close()
+        self.connections = []
+        self.devices = []
+        self.serials = []
+        self.producers = []
+
+    def busyChanged(self, notification, name):
+        contents = notification.contents
+        busy = ctypes.string_at(ctypes.addressof(contents) + type(contents).data.offset, 1) != b'\0'
+        if busy and not self.busy:
+            self.armed.set()
+        self.busy = busy
+
+    def beat(self):
+        count = 0
+        while True:
+            count += 1
+            try:
+                self.heartbeatPlc.write_by_name('MAIN.PyHeartbeat', count, pyads.PLCTYPE_UDINT)
+            except pyads.ADSError as e:
+                print("Heartbeat failed: " + str(e))
+            if self.stopping.wait(HEARTBEAT_PERIOD):
+                return
+
+    def connectDevice(self, address, name, k=None):
+        """ Connects to an IDS, reads its serial number and starts its
+        producer; replaces IDS number k if given.
+        """
+        dev = connectIDS(address, name)
+        # Nothing else may be asked of the IDS once its producer polls it
+        serial = dev.getSerialNumber()
+        producer = Producer(dev.getAxesDisplacement, RingBuffer())
+        producer.start()
+        if k is None:
+            self.devices.append(dev)
+            self.serials.append(serial)
+            self.producers.append(producer)
+        else:
+            self.devices[k], self.serials[k], self.producers[k] = dev, serial, producer
+
+    def startProducers(self):
+        self.producers = [Producer(dev.getAxesDisplacement, RingBuffer()) for dev in self.devices]
+        for producer in self.producers:
+            producer.start()
+
+    def stopProducers(self):
+        for producer in self.producers:
+            producer.stop()
+
+    def reconnect(self, k):
+        """ Stops the producer of IDS number k and connects to it again. """
+        address, name = self.idsAddresses[k]
+        self.producers[k].stop()
+        self.devices[k].close()
+        try:
+            self.connectDevice(address, name, k)
+        except Exception as e:
+            print("Could not reconnect AttoCube " + name + ": " + str(e))
+
+    def keepAlive(self):
+        """ Reconnects the IDS whose producer stopped, with an error or as
+        the last reconnection failed.
+        """
+        for k, (address, name) in enumerate(self.idsAddresses):
+            if not self.producers[k].running:
+                print("AttoCube " + name + " lost (" + str(self.producers[k].error) + "), reconnecting...")
+                self.reconnect(k)
+
+    def edgeSample(self):
+        """ Number of the first streamed sample of the test that armed the
+        run, after the last one with MAIN.PyLoadBusy low.
+        """
+        buffer = self.plcStream.buffer
+        times, samples, end = buffer.read(max(0, buffer.count - LOOKBACK))
+        if not samples:
+            return end
+        idle = np.flatnonzero(~np.array(samples)['MAIN.PyLoadBusy'])
+        return end - len(samples) + (idle[-1] + 1 if len(idle) else 0)
+
+    def run(self):
+        """ Records the test that armed the service with its readout and
+        queues the post-processing.
+
+        Returns
+        -------
+        fullFileName : str
+            CSV of the run, None if the test is not recorded by the service
+        """
+        first = self.edgeSample()
+        toggles = self.toggles.read()
+        dev206, dev207 = self.devices
+        if any(toggles[name] for name in STIFF_TOGGLES):
+            fullFileName = AttoCube_LC_Readout_Stiff.acquire(self.plc, dev206, dev207, self.plcStream, first,
+                                                             self.drainPlc, self.serials, self.producers)
+            post = AttoCube_LC_Readout_Stiff.post_process
+        elif any(toggles[name] for name in LC_TOGGLES):
+            # The LC readout asks the IDS itself
+            self.stopProducers()
+            try:
+                fullFileName = AttoCube_LC_Readout.acquire(self.plc, dev206, dev207, self.plcBlock)
+            finally:
+                self.startProducers()
+            post = AttoCube_LC_Readout.plot_results
+        else:
+            return None
+        self.post.submit(post, fullFileName).add_done_callback(
+            lambda future: print(("Post-processing of " + fullFileName + " failed: " + repr(future.exception()))
+                                 if future.exception() else ("Done: " + fullFileName)))
+        return fullFileName
+
+    def serve(self):
+        """ Records test after test until interrupted. """
+        while not self.stopping.is_set():
+            if not self.armed.wait(KEEPALIVE_PERIOD):
+                self.keepAlive()
+                continue
+            self.armed.clear()
+            try:
+                self.run()
+            except Exception as e:
+                # Keep serving; the next test is armed again by its own edge, with fresh IDS connections as a
+                # failed run can leave a reply unread on them
+                print("Run failed: " + repr(e))
+                for k in range(len(self.idsAddresses)):
+                    self.reconnect(k)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Warm acquisition service of the hardpoint test stand.")
+    parser.add_argument('--ams', default=AMS_NET_ID, help="AMS Net ID of the PLC")
+    parser.add_argument('--port', type=int, default=AMS_PORT)
+    args = parser.parse_args()
+
+    guard = claimInstance()
+    if guard is None:
+        exit("The acquisition service is already running.")
+    if not os.path.isdir(RESULTS_PATH):
+        os.mkdir(RESULTS_PATH)
+
+    service = Service(args.ams, args.port)
+    try:
+        service.start()
+        print("Waiting for MAIN.PyLoadBusy, Ctrl+C to stop")
+        service.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        guard.close()
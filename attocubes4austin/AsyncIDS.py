@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio counterpart of IDS.Device.
+
+AsyncDevice talks to the IDS over asyncio.open_connection and exposes the
+functions of IDS.Device as coroutines, so one event loop can drive both IDS
+units next to other tasks without blocking in readline(). The coroutines are
+not written out again: each one runs the IDS.Device function itself through
+ACS.Device.replay() and awaits the requests it sends, so method names,
+parameters and result decoding stay in one place.
+
+Example
+-------
+    dev206 = AsyncDevice('192.168.88.206')
+    dev207 = AsyncDevice('192.168.88.207')
+    await asyncio.gather(dev206.connect(), dev207.connect())
+    d206, d207 = await asyncio.gather(dev206.getAxesDisplacement(), dev207.getAxesDisplacement())
+"""
+
+import asyncio
+import json
+
+import ACS
+import IDS
+
+class AsyncDevice(object):
+    TCP_PORT = 9090
+
+    # IDS.Device functions that handle the connection themselves and get an asyncio version below
+    NOT_REPLAYED = ('waitUntilInMode', 'batch', 'getAxisDisplacements',
+                    'sendAxesDisplacementRequest', 'readAxesDisplacement',
+                    'sendAxisDisplacementRequests', 'readAxisDisplacements')
+
+    def __init__(self, address):
+        self.address = address
+        self.is_open = False
+        self.request_id = 0
+        self.pendingResponses = {}
+        # Unconnected IDS.Device used to run the driver functions
+        self.driver = IDS.Device(address)
+
+    @property
+    def language(self):
+        return self.driver.language
+
+    @language.setter
+    def language(self, language):
+        self.driver.language = language
+
+    async def connect(self):
+        """
+            Connects to the IDS and starts the task that receives responses.
+
+        """
+        if not self.is_open:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.address, self.TCP_PORT), 3)
+            self.receiver = asyncio.ensure_future(self.receive())
+            self.is_open = True
+
+    async def close(self):
+        """
+            Closes the connection to the device.
+
+        """
+        if self.is_open:
+            self.is_open = False
+            self.receiver.cancel()
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.failPending(ACS.AttoException("connection closed"))
+
+    def failPending(self, error):
+        for future in self.pendingResponses.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pendingResponses = {}
+
+    async def receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                self.is_open = False
+                self.failPending(ACS.AttoException("connection closed by device"))
+                return
+            response = json.loads(line)
+            future = self.pendingResponses.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+
+    async def request(self, method, params=False):
+        """ Asynchronous request. Any number of requests may be in flight,
+        replies are matched by their JSON-RPC id.
+        """
+        if not self.is_open:
+            raise ACS.AttoException("not connected, use connect()")
+        req = ACS.Device.buildRequest(self, method, params)
+        future = asyncio.get_running_loop().create_future()
+        self.pendingResponses[req["id"]] = future
+        self.writer.write(json.dumps(req).encode())
+        await self.writer.drain()
+        return await future
+
+    async def call(self, name, *args):
+        """ Runs the IDS.Device function name with its requests sent over
+        this connection.
+        """
+        function = getattr(IDS.Device, name)
+        responses = []
+        while True:
+            try:
+                return self.driver.replay(function, args, responses)
+            except ACS.RequestPending as pending:
+                responses.append(await self.request(pending.method, pending.params))
+
+    async def batch(self, calls):
+        """
+            Runs several IDS.Device functions with all of their requests in
+            flight at once.
+            Parameters
+            ----------
+            calls : list
+                (functionName, arg, ...) tuples
+            Returns
+            -------
+            results : list
+               return values of the functions in the order of calls
+            """
+        return list(await asyncio.gather(*[self.call(*call) for call in calls]))
+
+    async def getAxisDisplacements(self, axisNumbers=(0, 1, 2)):
+        """
+            Reads out the displacement values of several axes with all
+            requests in flight at once.
+        Parameters
+        ----------
+        axisNumbers : list
+            Axes to get the relative displacement from {0-2}
+        Returns
+        -------
+        displacements : list
+            Displacement of each requested axis in pm
+        """
+        return await self.batch([('getAxisDisplacement', axisNumber) for axisNumber in axisNumbers])
+
+    async def waitUntilInMode(self, desired_mode='system idle', timeout=30):
+        """
+            Waits for a maximum of timeout seconds until in the desired_mode
+            Parameters
+            ----------
+            desired_mode : str
+                Desired Mode
+            timeout : int
+                Timeout in seconds
+            Returns
+            -------
+            inMode : bool
+               True if the mode was reached
+            """
+        count = 0
+        while not await self.getCurrentMode() == desired_mode and count < timeout:
+            count += 1
+            await asyncio.sleep(1)
+        return count < timeout
+
+#-----------------------------------------------------------------------------------------------#
+
+def replayedCoroutine(name):
+    async def method(self, *args):
+        return await self.call(name, *args)
+    method.__name__ = name
+    method.__doc__ = getattr(IDS.Device, name).__doc__
+    return method
+
+# Every driver function of IDS.Device that is not connection handling becomes a coroutine of AsyncDevice
+for name in dir(IDS.Device):
+    if (name.startswith('_') or name in AsyncDevice.NOT_REPLAYED or hasattr(ACS.Device, name)
+            or not callable(getattr(IDS.Device, name))):
+        continue
+    setattr(AsyncDevice, name, replayedCoroutine(name))
+del name
@@ -1,255 +1,176 @@
 import os
 import pathlib
 import pyads
-import csv
 from sys import exit
-import datetime
-from datetime import datetime as dt
-from time import monotonic
-from IDS import Device
-from matplotlib.backends.backend_pdf import PdfPages
-import matplotlib.pyplot as plt
+from time import monotonic, perf_counter_ns, sleep
+from Acquisition import (connectIDS, resultsFileName, RESULTS_PATH, PlcNotifications, SampleDrain,
+                         writeDisplacements, RingBuffer, Producer, Merger)
+from Recording import Recorder, BackgroundWriter, exportCSV
+from Calibration import CalibrationStore
+from Stiffness import StreamingRegression, STIFFNESS_FIELDS, LOAD_FIELD, segmentCycles, cycleMetrics
+from Report import renderReport, STIFFNESS_PLOTS
+from Timing import StageTimer
 import numpy as np
 import pandas as pd
 
-J = np.array([[-0.0931,    0.4916,   -0.8658,   -0.1226,   -0.0119,    0.0064],
-             [-0.1192,    0.4903,   -0.8634,   -0.1223,    0.0193,    0.0278],
-             [0.1827,    0.6106,   -0.7706,    0.0953,   -0.1074,   -0.0625],
-             [0.1964,    0.5962,   -0.7784,    0.0719,   -0.1225,   -0.0757],
-             [-0.1134,   -0.0576,   -0.9919,    0.0931,    0.1340,   -0.0184],
-             [-0.1281,   -0.0835,   -0.9882,    0.0619,    0.1513,   -0.0208]])
-
-optical_paths = np.array([0, 0, 0, 0, 0, 0])
-
-matrix_result = np.array([[0], [0], [0], [0], [0], [0]])
+# Seconds between two passes of the merge stage; the producers keep sampling in the meantime
+MERGE_PERIOD = 0.05
+
+# Seconds between two updates of the online stiffness fit on the PLC/HMI
+PUBLISH_PERIOD = 1.0
+
+# Time every stage of the acquisition and save the histograms next to the CSV as <name>_timing.json
+STAGE_TIMING = False
+
+# Define the field names to be used for the CSV. THIS MUST MATCH THE COLUMNS OF pass_columns()!!!
+fieldnames = ['Index',
+              'Seconds',
+              'PLC Time',
+              '206Ch1 [pM]',
+              '206Ch2 [pM]',
+              '206Ch3 [pM]',
+              '207Ch1 [pM]',
+              '207Ch2 [pM]',
+              '207Ch3 [pM]',
+              'Atto Avg. [uM]',
+              'ActCount [cts]',
+              'engAct [mm]',
+              'MirCount [cts]',
+              'engMir [mm]',
+              'loadCell [N]',
+              'mtrPos [cts]',
+              'mtrRPM',
+              'mtrCurnt [A]',
+              'encTemp [C]',
+              'mtrTemp [C]',
+              'bwyPSI',
+              'flowRate [slpm]',
+              'Setpoint [cts]',
+              'Interfer [mm]',
+              'BWY [mm]',
+              'AttoX [uM]',
+              'AttoY [uM]',
+              'AttoZ [uM]',
+              'AttoRotX [uRad]',
+              'AttoRotY [uRad]',
+              'AttoRotZ [uRad]',
+              'SA LC [N]',
+              'Setpoint [N]',
+              '206 Seconds',
+              '207 Seconds']
+
+# Create list of variable names pushed by the PLC
+var_list = [
+        'GVL_TS.ActEncCount',
+        'MAIN.engActEnc',
+        'GVL_TS.MirEncCount',
+        'MAIN.engMirEnc',
+        'GVL_TS.LC_InR',
+        'GVL_TS.mtr_pos',
+        'MAIN.mtrRPM',
+        'MAIN.mtrCurrent',
+        'MAIN.EncTemp',
+        'MAIN.MtrTemp',
+        'MAIN.BWYPressPSI',
+        'MAIN.FlowRate',
+        'MAIN.fbPLOOP.fSetpointValue',
+        'MAIN.COARSE_VAL',
+        'MAIN.sTime',
+        'MAIN.PyLoadBusy',
+        'MAIN.tglSine',
+        'MAIN.tglROM',
+        'MAIN.tglStiffness',
+        'MAIN.tglBWY',
+        'MAIN.tglPLoop',
+        'MAIN.rb_x',
+        'MAIN.sp_x'
+        ]
 
 #-----------------------------------------------------------------------------------------------#
 
-def save_image(filename):
-    
-    # PdfPages is a wrapper around pdf 
-    # file so there is no clash and create
-    # files with no error.
-    p = PdfPages(filename)
-      
-    # get_fignums Return list of existing 
-    # figure numbers
-    fig_nums = plt.get_fignums()  
-    figs = [plt.figure(n) for n in fig_nums]
-      
-    # iterating over the numbers in list
-    for fig in figs: 
-        
-        # and saving the files
-        fig.savefig(p, format='pdf') 
-      
-    # close the object
-    p.close()  
-    
-#-----------------------------------------------------------------------------------------------#
-
-# Try establish connection to AttoCube 206 and get info from device; If unable, print error to console and exit
-try:
-    print("Connecting to AttoCubube 206...")
-    dev206 = Device('192.168.88.206')
-    dev206.connect()
-    
-    print(dev206.getFeatureName(1)) #OK
-    print(dev206.getSerialNumber()) #OK
-    print(dev206.getFpgaVersion()) #OK
-    print(dev206.getMacAddress()) #OK
-    print(dev206.getDeviceType()) #OK
-    print(dev206.getDeviceName()) #OK
-    print("#206 CONNECTED \n")
-
-
-    print("Connecting to AttoCubube 207...")
-    dev207 = Device('192.168.88.207')
-    dev207.connect()
-    
-    print(dev207.getFeatureName(1)) #OK
-    print(dev207.getSerialNumber()) #OK
-    print(dev207.getFpgaVersion()) #OK
-    print(dev207.getMacAddress()) #OK
-    print(dev207.getDeviceType()) #OK
-    print(dev207.getDeviceName()) #OK
-    print("#207 CONNECTED \n")
-    
-except:
-    print("Could not connect to AttoCubes.\n Please check connection and try again.\n Now exiting.")
-    exit()
-
-# Try to establish connection to HPT Teststand at known NetID; If unable, print error to console and exit
-AMSAddr = "10.10.160.129.1.1"
-Port = 851
-try:
-    print("Connecting to Hardpoint teststand...")
-    #plc = pyads.Connection('10.10.160.129.1.1', 851)
-    plc = pyads.Connection(AMSAddr, Port)
-    plc.open()
-    print("Local address: " + str(plc.get_local_address()) + "\n")
-    print("CONNECTED TO HARDPOINT TESTSTAND")
-
-except:
-    print("Could not connect to hardpoint teststand.\n Check that the NetID of the local machine is entered correctly.\n Now exiting.")
-    exit()
-
-# Try to establsih ADS Symbol Transaction at server cycle frequency; If unable, print error to console and exit
-try:
-    pyads.constants.ADSTRANS_SERVERCYCLE = 3
-except:
-    print("ERROR SETTING SYMBOL READ TO SERVER CYCLE MODE")
-
-
-# Try to open folder at PATH location; If it doesnt exisit, create it. If unable, print error to console, print current
-# PATH locations for troubleshooting, and exit 
-try:
-    
-    if not os.path.isdir("\AttoCube_Results"):
-        os.mkdir("\AttoCube_Results") 
-
-except:
-    print("ERROR IN FOLDER ACCESS")
-    print("Current script directory: " + str(pathlib.Path(__file__).parent.resolve()))
-    print("Current working directory: " + str(pathlib.Path().resolve()) )
-    exit()
-
-# Create new timestamped filename
-HPT_NAME = plc.read_by_name("MAIN.sSelHPT", pyads.PLCTYPE_STRING)
-startDate = datetime.date.today()
-startTime = dt.now()
-fileNameTS = HPT_NAME + "-" + startDate.strftime("%Y%m%d") + "_" + startTime.strftime("%Hh%Mm")
-pathName = '\AttoCube_Results'
-fullFileName = pathName + "\\" + fileNameTS + ".csv"
-
-# Start collecting data
-print("Starting data collection...")
-
-# Use monotonic time so time never has a negative value
-t0 = monotonic()
-# Start CSV index at zero
-index = 0
-
-# Create new CSV file at previously created folder location with PLC_file name. Create all appropriate field names in for
-# CSV dictionary sample collection.
-with open(fullFileName, 'w', newline='') as PLC_file:
-    
-    # Define the field names to be used for the CSV. THIS MUST MATCH THE .writerow() CALL!!!
-    fieldnames = ['Index',
-                  'Seconds',
-                  'PLC Time',
-                  '206Ch1 [pM]', 
-                  '206Ch2 [pM]',
-                  '206Ch3 [pM]',
-                  '207Ch1 [pM]', 
-                  '207Ch2 [pM]',
-                  '207Ch3 [pM]',
-                  'Atto Avg. [uM]',
-                  'ActCount [cts]', 
-                  'engAct [mm]', 
-                  'MirCount [cts]',
-                  'engMir [mm]',
-                  'loadCell [N]',
-                  'mtrPos [cts]',
-                  'mtrRPM',
-                  'mtrCurnt [A]',
-                  'encTemp [C]',
-                  'mtrTemp [C]',
-                  'bwyPSI',
-                  'flowRate [slpm]',
-                  'Setpoint [cts]',
-                  'Interfer [mm]',
-                  'BWY [mm]',
-                  'AttoX [uM]',
-                  'AttoY [uM]',
-                  'AttoZ [uM]',
-                  'AttoRotX [uRad]',
-                  'AttoRotY [uRad]',
-                  'AttoRotZ [uRad]',
-                  'SA LC [N]',
-                  'Setpoint [N]']
-    
-    # Create new instance of CSV writer, write dictionary defined above
-    PLC_writer = csv.DictWriter(PLC_file, fieldnames=fieldnames)
-
-    # Write header to CSV file
-    PLC_writer.writeheader()
-
-    # Create list of variable names to be block read from the PLC
-    var_list = [
-            'GVL_TS.ActEncCount',
-            'MAIN.engActEnc',
-            'GVL_TS.MirEncCount',
-            'MAIN.engMirEnc',
-            'GVL_TS.LC_InR',
-            'GVL_TS.mtr_pos',
-            'MAIN.mtrRPM',
-            'MAIN.mtrCurrent',
-            'MAIN.EncTemp',
-            'MAIN.MtrTemp',
-            'MAIN.BWYPressPSI',
-            'MAIN.FlowRate',
-            'MAIN.fbPLOOP.fSetpointValue',
-            'MAIN.COARSE_VAL',
-            'MAIN.sTime',
-            'MAIN.PyLoadBusy',
-            'MAIN.tglSine',
-            'MAIN.tglROM',
-            'MAIN.tglStiffness',
-            'MAIN.tglBWY',
-            'MAIN.tglPLoop',
-            'MAIN.rb_x',
-            'MAIN.sp_x'
-            ]
-
-    symbols = plc.read_list_by_name(var_list)
-
-    # Loop for t seconds pulling data from both AttoCubes and all PLC symbols, writing a new line to CSV file on each loop
-    while symbols['MAIN.PyLoadBusy'] == True:
-        
-        # Grab all symbols defined in var_list; if more are desired to be recorded, all that is recquired is to add the
-        # PLC symbol name into var_list and call by name
-        symbols = plc.read_list_by_name(var_list)
-        
-        # Grab each axis from both AttoCubes and store to individual variables in order to average them later.
-        # This is done to avoid having to make a second call to the AttoCubes and slowing down the overall sample rate
-        Dev206Ch0 = dev206.getAxisDisplacement(0)
-        Dev206Ch1 = dev206.getAxisDisplacement(1)
-        Dev206Ch2 = dev206.getAxisDisplacement(2)
-        Dev207Ch0 = dev207.getAxisDisplacement(0)
-        Dev207Ch1 = dev207.getAxisDisplacement(1)
-        Dev207Ch2 = dev207.getAxisDisplacement(2)
-        
-        plc.write_by_name('MAIN.atto1', Dev206Ch0)  # write to target
-        plc.write_by_name('MAIN.atto2', Dev206Ch1)  # write to target
-        plc.write_by_name('MAIN.atto3', Dev206Ch2)  # write to target
-        plc.write_by_name('MAIN.atto4', Dev207Ch0)  # write to target
-        plc.write_by_name('MAIN.atto5', Dev207Ch1)  # write to target
-        plc.write_by_name('MAIN.atto6', Dev207Ch2)  # write to target
-        
-        optical_paths = ([Dev206Ch0, Dev206Ch1, Dev206Ch2, Dev207Ch0, Dev207Ch1, Dev207Ch2])
-        
-        matrix_result = np.dot(optical_paths, J)
-        
-        # Increment index number
-        index = index + 1
-        
-        
-        # Write a new row in the CSV based on the fieldnames defined above
-        PLC_writer.writerow({
-            'Index' : index,
-            'Seconds': monotonic() - t0,
+def acquire(plc, dev206, dev207, plcStream=None, first=0, drainPlc=None, serials=None, producers=None,
+            pathName=RESULTS_PATH):
+
+    # Record one test, from the rising edge of MAIN.PyLoadBusy until it falls, and return the name of its CSV.
+    # plcStream is a PlcNotifications on var_list that is already running, e.g. the acquisition service's, with
+    # the samples of the test in its buffer from sample number first on; one of its own is started otherwise.
+    # drainPlc is the connection SampleDrain reads on, plc if not given. serials are those of 206 and 207 if known.
+    # producers are the Producers of 206 and 207 if they already poll them, e.g. the service's, which then also has
+    # to give serials; they are left running. The files of the run go to the folder pathName
+
+    # Nothing else may be asked of the AttoCubes once their producers run, so the serials are read before
+    if serials is None:
+        serials = [dev206.getSerialNumber(), dev207.getSerialNumber()]
+    timer = StageTimer(STAGE_TIMING)
+    ownProducers = producers is None
+    if ownProducers:
+        producers = [Producer(timer.wrap('IDS 206', dev206.getAxesDisplacement), RingBuffer()),
+                     Producer(timer.wrap('IDS 207', dev207.getAxesDisplacement), RingBuffer())]
+        for producer in producers:
+            producer.start()
+    try:
+        return record_test(plc, plcStream, first, drainPlc, serials, producers, timer, pathName)
+    finally:
+        if ownProducers:
+            for producer in producers:
+                producer.stop()
+
+def record_test(plc, plcStream, first, drainPlc, serials, producers, timer, pathName):
+
+    # The recording part of acquire(), while the producers run
+    attoBuffers = [producer.buffer for producer in producers]
+
+    # Create new timestamped filename
+    HPT_NAME, fullFileName = resultsFileName(plc, pathName)
+
+    # Look up the Jacobian calibration of this hardpoint and pair of AttoCubes and note which one the run uses. Its J
+    # with the pm to um/urad scaling folded in is applied to whole blocks of optical paths
+    calibration = CalibrationStore().load(HPT_NAME, serials)
+    calibration.record(fullFileName[:-4] + "_calibration.json")
+    print("Using calibration " + calibration.name)
+    pose = calibration.pose()
+
+    # The data is recorded in binary columns during the test and exported to the CSV afterwards
+    recordingFileName = fullFileName[:-4] + ".npyc"
+    # Every PLC cycle of the test as raw ST_Sample records, drained from the PLC's sample buffer
+    plcSampleFileName = fullFileName[:-4] + "_plc.bin"
+
+    # Start collecting data
+    print("Starting data collection...")
+
+    # Seconds count from the first recorded PLC sample, which can be older than this call when the samples of the
+    # test come from a stream that was already running; set by the loop before the first pass goes to the writer
+    t0 = None
+    # Start CSV index at zero
+    index = 0
+    last_publish = 0.0
+    # Fit taken by the writer thread for the acquisition loop to publish, which owns the plc connection
+    latest_fit = None
+
+    def pass_columns(block):
+
+        # Turn one pass of merged samples into the columns of the recording, one array of n values per field. Runs on
+        # the writer thread, off the acquisition loop
+        index, plc_times, plc_samples, optical_paths, atto_times = block
+        symbols = np.array(plc_samples)
+        start = perf_counter_ns()
+        atto_pose = pose.transform(optical_paths)
+        timer.record('Jacobian transform', start)
+        n = len(plc_times)
+        return {
+            'Index' : np.arange(index + 1, index + n + 1),
+            'Seconds': plc_times - t0,
             'PLC Time' : symbols['MAIN.sTime'],
-            '206Ch1 [pM]': Dev206Ch0,
-            '206Ch2 [pM]': Dev206Ch1, 
-            '206Ch3 [pM]': Dev206Ch2, 
-            '207Ch1 [pM]': Dev207Ch0, 
-            '207Ch2 [pM]': Dev207Ch1,
-            '207Ch3 [pM]': Dev207Ch2,
-            'Atto Avg. [uM]' : ((Dev206Ch0 + Dev206Ch1 + Dev206Ch2 + Dev207Ch0 + Dev207Ch1+ Dev207Ch2) / 6) / 1000000, # Average all Attos and convert to uM
+            '206Ch1 [pM]': optical_paths[:, 0],
+            '206Ch2 [pM]': optical_paths[:, 1],
+            '206Ch3 [pM]': optical_paths[:, 2],
+            '207Ch1 [pM]': optical_paths[:, 3],
+            '207Ch2 [pM]': optical_paths[:, 4],
+            '207Ch3 [pM]': optical_paths[:, 5],
+            'Atto Avg. [uM]' : optical_paths.mean(axis=1) / 1000000, # Average all Attos and convert to uM
             'ActCount [cts]' : symbols['GVL_TS.ActEncCount'],
             'engAct [mm]' : symbols['MAIN.engActEnc'],
-            'MirCount [cts]' : symbols['GVL_TS.MirEncCount'], 
+            'MirCount [cts]' : symbols['GVL_TS.MirEncCount'],
             'engMir [mm]' : symbols['MAIN.engMirEnc'],
             'loadCell [N]' : symbols['GVL_TS.LC_InR'],
             'mtrPos [cts]' : symbols['GVL_TS.mtr_pos'],
@@ -257,128 +178,235 @@ with open(fullFileName, 'w', newline='') as PLC_file:
             'mtrCurnt [A]' : symbols['MAIN.mtrCurrent'],
             'encTemp [C]' : symbols['MAIN.EncTemp'],
             'mtrTemp [C]' : symbols['MAIN.MtrTemp'],
-            'bwyPSI' :  symbols['MAIN.BWYPressPSI'],     
+            'bwyPSI' :  symbols['MAIN.BWYPressPSI'],
             'flowRate [slpm]' : symbols['MAIN.FlowRate'],
             'Setpoint [cts]' : symbols['MAIN.fbPLOOP.fSetpointValue'],
             'Interfer [mm]' : symbols['MAIN.COARSE_VAL'],
             'BWY [mm]' : (symbols['MAIN.engMirEnc'] - symbols['MAIN.engActEnc']),
-            'AttoX [uM]' : matrix_result[0] / 1000000,
-            'AttoY [uM]' : matrix_result[1] / 1000000,
-            'AttoZ [uM]' : matrix_result[2] / 1000000,
-            'AttoRotX [uRad]' : matrix_result[3] / 1000000,
-            'AttoRotY [uRad]' : matrix_result[4] / 1000000,
-            'AttoRotZ [uRad]' : matrix_result[5] / 1000000,
+            'AttoX [uM]' : atto_pose[:, 0],
+            'AttoY [uM]' : atto_pose[:, 1],
+            'AttoZ [uM]' : atto_pose[:, 2],
+            'AttoRotX [uRad]' : atto_pose[:, 3],
+            'AttoRotY [uRad]' : atto_pose[:, 4],
+            'AttoRotZ [uRad]' : atto_pose[:, 5],
             'SA LC [N]' : symbols['MAIN.rb_x'],
-            'Setpoint [N]' : symbols['MAIN.sp_x']                        
-            })
-
-# Close all connections to both AttoCubes and HPTTS and exit
-plc.close()
-dev206.close()
-dev207.close()
+            'Setpoint [N]' : symbols['MAIN.sp_x'],
+            '206 Seconds' : atto_times[:, 0] - t0,
+            '207 Seconds' : atto_times[:, 1] - t0
+        }
+
+    def record_pass(block):
+
+        # Writer thread: record one pass, add it to the online stiffness fit and hand the fit to the loop now and then
+        nonlocal last_publish, latest_fit
+        columns = pass_columns(block)
+        start = perf_counter_ns()
+        PLC_writer.append(columns)
+        timer.record('Recording write', start)
+        stiffness.update(np.column_stack([columns[field] for field in STIFFNESS_FIELDS]), columns[LOAD_FIELD])
+        if monotonic() - last_publish > PUBLISH_PERIOD:
+            latest_fit = stiffness.fit()
+            last_publish = monotonic()
+
+    # Create new recording at previously created folder location with PLC_file name. Create all appropriate field names
+    # for the columns of the recording and the CSV exported from it.
+    with open(recordingFileName, 'wb') as PLC_file:
+
+        # Create new instance of the recorder, which writes the field names as the header of the file
+        PLC_writer = Recorder(PLC_file, fieldnames)
+        # The recorder runs on its own writer thread, so the acquisition loop below never waits for the disk
+        writer = BackgroundWriter(record_pass, PLC_writer.flush)
+        # Load against every displacement channel, fitted as the samples are recorded
+        stiffness = StreamingRegression()
+
+        # The PLC pushes the symbol block every task cycle with ADS notifications, and one producer thread per AttoCube
+        # polls it as fast as it answers. Each stream goes into its own timestamped ring buffer, and the merge stage
+        # aligns the AttoCube streams to the PLC samples
+        ownStream = plcStream is None
+        if ownStream:
+            plcStream = PlcNotifications(plc, var_list, RingBuffer())
+        merger = Merger(plcStream.buffer, attoBuffers)
+        merger.next = first
+        plcSampleFile = open(plcSampleFileName, 'wb')
+        sampleWriter = BackgroundWriter(lambda samples: plcSampleFile.write(samples.tobytes()))
+        sampleDrain = SampleDrain(drainPlc or plc, lambda samples: sampleWriter.put(samples, len(samples)))
+        # The PLC samples arrive by notification; what is read from the PLC is the block pushed every cycle and the
+        # halves of the sample buffer
+        if ownStream:
+            plcStream.callback = timer.wrap('PLC notification', plcStream.callback)
+        sampleDrain.readHalf = timer.wrap('PLC sample buffer read', sampleDrain.readHalf)
+        writer.start()
+        sampleWriter.start()
+        sampleDrain.start()
+        if ownStream:
+            plcStream.start()
+        try:
+            # Loop until the PLC ends the test, writing a new line to CSV file for every PLC sample
+            busy = plc.read_by_name("MAIN.PyLoadBusy", pyads.PLCTYPE_BOOL)
+            started = False
+            while busy == True:
+
+                sleep(MERGE_PERIOD)
+                for producer in producers:
+                    if producer.error is not None:
+                        raise producer.error
+                for stage in (sampleDrain, writer, sampleWriter):
+                    if stage.error is not None:
+                        raise stage.error
+
+                # Grab all PLC samples since the last pass with both AttoCubes interpolated to their times
+                start = perf_counter_ns()
+                plc_times, plc_samples, optical_paths, atto_times = merger.merge()
+                timer.record('Merge', start)
+                if not started and len(plc_times):
+                    # A stream that was already running can still hold samples from before the test, skip those
+                    test = np.array(plc_samples)['MAIN.PyLoadBusy']
+                    k = int(np.argmax(test)) if test.any() else len(test)
+                    plc_times, plc_samples, optical_paths, atto_times = (plc_times[k:], plc_samples[k:],
+                                                                         optical_paths[k:], atto_times[k:])
+                    started = len(plc_times) > 0
+                    if started:
+                        t0 = plc_times[0]
+                if len(plc_times) == 0:
+                    continue
+
+                # Hand the newest AttoCube reading to the PLC for display, all six symbols in one write
+                start = perf_counter_ns()
+                writeDisplacements(plc, optical_paths[-1])
+                timer.record('PLC write-back', start)
+
+                # Show the newest stiffness fit on the HMI; pyads handles one request at a time per connection, so
+                # only this thread writes to plc
+                fit = latest_fit
+                if fit is not None:
+                    latest_fit = None
+                    stiffness.publish(plc, fit=fit)
+
+                # The columns and the pose of this pass are worked out on the writer thread
+                n = len(plc_times)
+                writer.put((index, plc_times, plc_samples, optical_paths, atto_times), n)
+
+                # Increment index number and keep the newest sample for the loop condition
+                index = index + n
+                busy = plc_samples[-1]['MAIN.PyLoadBusy']
+        finally:
+            # Whether the test ended or the loop failed, stop the stages and write out what they hold
+            if ownStream:
+                plcStream.stop()
+            try:
+                # Once PyLoadBusy has fallen the PLC stopped recording and the last partial half can be read
+                sampleDrain.stop()
+            finally:
+                # Write what is still queued, including the samples held in the recorder's columns
+                writer.stop()
+                sampleWriter.stop()
+                plcSampleFile.close()
+
+        print("PLC samples: " + str(sampleDrain.samples) + " saved, " + str(sampleDrain.lost) + " lost")
+        if merger.dropped:
+            print("PLC samples older than the first AttoCube samples: " + str(merger.dropped) + " not merged")
+        print(writer.report())
+        print(sampleWriter.report())
+
+        # Final stiffness of the whole run, on the HMI as soon as the test ends
+        stiffness.publish(plc)
+        slopes, intercepts, r2s = stiffness.fit()
+        for field, slope, intercept, r2 in zip(STIFFNESS_FIELDS, slopes, intercepts, r2s):
+            print(f'{field}: y = {slope:.4f}x {intercept:+.4f}, R2 = {r2:.4f}')
+
+        # Save where the time of each stage went
+        if STAGE_TIMING:
+            print(timer.report())
+            timer.dump(fullFileName[:-4] + "_timing.json")
+
+    return fullFileName
+
+def post_process(fullFileName):
+
+    # Export the recording to the CSV now that the test is over
+    exportCSV(fullFileName[:-4] + ".npyc", fullFileName)
+
+    df = pd.read_csv(fullFileName, usecols=fieldnames)
+
+    # Split the run into the load cycles of the stiffness test and save the stiffness and hysteresis of every cycle
+    cycles = segmentCycles(df[LOAD_FIELD].to_numpy())
+    metrics = cycleMetrics(df[STIFFNESS_FIELDS].to_numpy(), df[LOAD_FIELD].to_numpy(), cycles)
+    cycle_table = {'Cycle': np.arange(1, len(cycles) + 1),
+                   'Start Index': df['Index'].to_numpy()[cycles[:, 0]] if len(cycles) else [],
+                   'Stop Index': df['Index'].to_numpy()[cycles[:, 2] - 1] if len(cycles) else []}
+    for k, field in enumerate(STIFFNESS_FIELDS):
+        cycle_table[field + ' Stiffness'] = metrics['stiffness'][:, k]
+        cycle_table[field + ' Load Stiffness'] = metrics['loadStiffness'][:, k]
+        cycle_table[field + ' Unload Stiffness'] = metrics['unloadStiffness'][:, k]
+        cycle_table[field + ' Hysteresis'] = metrics['hysteresis'][:, k]
+    pd.DataFrame(cycle_table).to_csv(fullFileName[:-4] + "_cycles.csv", index=False)
+    print(str(len(cycles)) + " load cycles")
+    for field, std, relative in zip(STIFFNESS_FIELDS, metrics['repeatability'], metrics['relativeRepeatability']):
+        print(f'{field}: stiffness repeatability {std:.4f} ({100 * relative:.2f} %)')
+
+    fullFileNamePDF = fullFileName[:-4] + ".pdf"
+
+    print(min(df['Atto Avg. [uM]']))
+    print(max(df['Atto Avg. [uM]']))
+
+    # Plot the load against every channel with its fit and save the pages to a multi-page PDF
+    renderReport(df, fullFileNamePDF, STIFFNESS_PLOTS)
 
 #-----------------------------------------------------------------------------------------------#
 
-df = pd.read_csv(fullFileName, usecols=fieldnames)
-
-# Set the figure size
-plt.rcParams["figure.figsize"] = [14.00, 7.00]
-plt.rcParams["figure.autolayout"] = True
-fullFileNamePDF = fullFileName[:-4] + ".pdf"
-
-print(min(df['Atto Avg. [uM]']))
-print(max(df['Atto Avg. [uM]']))
-
-df.plot(x=9, y=14, legend=False, xlabel="Attocube Avg. [um]", ylabel="Loadcell [N]", label="Attocube Results")
-m, b = np.polyfit(df['Atto Avg. [uM]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.1f}x {b:+.1f}')
-plt.xlim((min(df['Atto Avg. [uM]'])), (max(df['Atto Avg. [uM]'])))
-#plt.xlim((min(df['Atto Avg. [uM]']) + 0.1*(min(df['Atto Avg. [uM]'])), (max(df['Atto Avg. [uM]'])) + 0.1*(max(df['Atto Avg. [uM]']))))
-plt.ylim((min(df['loadCell [N]']) + 0.3*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.3*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=11, y=14, legend=False, xlabel="Actuator [mm]", ylabel="Loadcell [N]", label="Actuator Results")
-m, b = np.polyfit(df['engAct [mm]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['engAct [mm]'])), (max(df['engAct [mm]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=13, y=14, legend=False, xlabel="Mirror [um]", ylabel="Loadcell [N]", label="Mirror Results")
-m, b = np.polyfit(df['engMir [mm]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['engMir [mm]'])), (max(df['engMir [mm]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=24, y=14, legend=False, xlabel="BWY [mm]", ylabel="Loadcell [N]", label="BWY Results")
-m, b = np.polyfit(df['BWY [mm]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['BWY [mm]'])), (max(df['BWY [mm]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=25, y=14, legend=False, xlabel="Atto X Displacement [uM]", ylabel="Loadcell [N]", label="Atto X")
-m, b = np.polyfit(df['AttoX [uM]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoX [uM]'])), (max(df['AttoX [uM]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=26, y=14, legend=False, xlabel="Atto Y Displacement [uM]", ylabel="Loadcell [N]", label="Atto Y")
-m, b = np.polyfit(df['AttoY [uM]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoY [uM]'])), (max(df['AttoY [uM]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=27, y=14, legend=False, xlabel="Atto Z Displacement [uM]", ylabel="Loadcell [N]", label="Atto Z")
-m, b = np.polyfit(df['AttoZ [uM]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoZ [uM]'])), (max(df['AttoZ [uM]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=28, y=14, legend=False, xlabel="Atto X Rotation [uRad]", ylabel="Loadcell [N]", label="Atto RotX")
-m, b = np.polyfit(df['AttoRotX [uRad]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoRotX [uRad]'])), (max(df['AttoRotX [uRad]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=29, y=14, legend=False, xlabel="Atto Y Rotation [uRad]", ylabel="Loadcell [N]", label="Atto RotY")
-m, b = np.polyfit(df['AttoRotY [uRad]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoRotY [uRad]'])), (max(df['AttoRotY [uRad]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=30, y=14, legend=False, xlabel="Atto Z Rotation [uRad]", ylabel="Loadcell [N]", label="Atto RotZ")
-m, b = np.polyfit(df['AttoRotZ [uRad]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoRotZ [uRad]'])), (max(df['AttoRotZ [uRad]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=32, y=31, legend=False, xlabel="SA Setpoint [N]", ylabel="SA LC [N]", label="SA LC")
-m, b = np.polyfit(df['Setpoint [N]'], df['SA LC [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['Setpoint [N]'])), (max(df['Setpoint [N]'])))
-plt.ylim((min(df['SA LC [N]']) + 0.1*min(df['SA LC [N]'])), (max(df['SA LC [N]']) + 0.1*max(df['SA LC [N]'])))
-plt.legend()
-plt.Figure()
-
-# Save to multi-page PDF
-save_image(fullFileNamePDF)
-
-exit("Done.")
\ No newline at end of file
+if __name__ == '__main__':
+
+    # Try establish connection to AttoCubes 206 and 207 and get info from devices; If unable, print error to console and exit
+    try:
+        dev206 = connectIDS('192.168.88.206', '206')
+        dev207 = connectIDS('192.168.88.207', '207')
+
+    except:
+        print("Could not connect to AttoCubes.\n Please check connection and try again.\n Now exiting.")
+        exit()
+
+    # Try to establish connection to HPT Teststand at known NetID; If unable, print error to console and exit
+    AMSAddr = "10.10.160.129.1.1"
+    Port = 851
+    try:
+        print("Connecting to Hardpoint teststand...")
+        #plc = pyads.Connection('10.10.160.129.1.1', 851)
+        plc = pyads.Connection(AMSAddr, Port)
+        plc.open()
+        print("Local address: " + str(plc.get_local_address()) + "\n")
+        print("CONNECTED TO HARDPOINT TESTSTAND")
+
+    except:
+        print("Could not connect to hardpoint teststand.\n Check that the NetID of the local machine is entered correctly.\n Now exiting.")
+        exit()
+
+    # Try to establsih ADS Symbol Transaction at server cycle frequency; If unable, print error to console and exit
+    try:
+        pyads.constants.ADSTRANS_SERVERCYCLE = 3
+    except:
+        print("ERROR SETTING SYMBOL READ TO SERVER CYCLE MODE")
+
+
+    # Try to open folder at PATH location; If it doesnt exisit, create it. If unable, print error to console, print current
+    # PATH locations for troubleshooting, and exit
+    try:
+
+        if not os.path.isdir(RESULTS_PATH):
+            os.mkdir(RESULTS_PATH)
+
+    except:
+        print("ERROR IN FOLDER ACCESS")
+        print("Current script directory: " + str(pathlib.Path(__file__).parent.resolve()))
+        print("Current working directory: " + str(pathlib.Path().resolve()) )
+        exit()
+
+    fullFileName = acquire(plc, dev206, dev207)
+
+    # Close all connections to both AttoCubes and HPTTS and exit
+    plc.close()
+    dev206.close()
+    dev207.close()
+
+    post_process(fullFileName)
+
+    exit("Done.")
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput and timing benchmark of the acquisition paths, run against the
+local stand-ins for the IDS (IDSSimulator, one per AttoCube) and the test
+stand PLC (PLCSimulator), all in this process.
+
+The paths are the acquisition functions of the readout scripts themselves,
+with the results written to a temporary folder and read back for the
+metrics:
+-stiff: AttoCube_LC_Readout_Stiff.acquire() of a stiffness test ended after
+the duration, PLC samples pushed by notifications, one producer thread per
+AttoCube, the merge stage, the write-back of MAIN.atto1..6, the pose
+transform and the recorder on its writer thread, and the PLC sample buffer
+drained alongside.
+-posrep: AttoCube_PosRep_Readout_3.acquire() with the duration split over
+its setpoint steps, one SymbolBlock read and one pipelined
+readDisplacements of both AttoCubes per sample, written with
+csv.DictWriter.
+-test: test_attocube.acquire(), readDisplacements of one AttoCube into a
+list.
+
+For every path it reports the samples per second, percentiles of the sample
+period, the skew between the readings of 206 and 207 of the same sample,
+the share of samples whose displacement repeats the previous one, and the
+CPU time per sample of the acquisition alone (the CPU time of the stand-in
+threads is taken off where the platform can measure it per thread).
+
+Usage
+-----
+    python Benchmark.py [--paths stiff posrep test] [--duration 10]
+                        [--latency 0.0005] [--jitter 0.0002] [--rate 10000]
+                        [--output results.json] [--baseline old.json]
+
+The results are stored as JSON (benchmark_<date>_<time>.json by default);
+with --baseline the change of every metric against an earlier result is
+printed as well.
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import platform
+import tempfile
+import threading
+import time
+from time import sleep
+import numpy as np
+import pyads
+import IDSSimulator
+import PLCSimulator
+from IDS import Device
+from Recording import RECORDING_EXTENSION, readRecording
+import AttoCube_LC_Readout_Stiff
+import AttoCube_PosRep_Readout_3
+import test_attocube
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+class StandIns(object):
+    """ IDS 206 and 207 and the test stand PLC, started in this process.
+
+    Parameters
+    ----------
+    latency, jitter, rate, noise :
+        passed to both IDSSimulator.Simulator
+    cycle : float
+        PLC task cycle in s
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, rate=10000.0, noise=50.0, cycle=0.001):
+        self.ids = [IDSSimulator.Simulator(port=0, latency=latency, jitter=jitter, rate=rate, noise=noise,
+                                           serial='SIM' + name, seed=k)
+                    for k, name in enumerate(('206', '207'))]
+        self.plc = PLCSimulator.Simulator(cycle=cycle, tick=cycle, seed=2)
+
+    def start(self):
+        for simulator in self.ids:
+            simulator.start()
+        self.plc.start()
+
+    def stop(self):
+        self.plc.stop()
+        for simulator in self.ids:
+            simulator.stop()
+
+    def device(self, k):
+        """ IDS.Device connected to stand-in k, 0 for 206, 1 for 207. """
+        dev = Device('127.0.0.1')
+        dev.TCP_PORT = self.ids[k].port
+        dev.connect()
+        return dev
+
+    def cpuTime(self):
+        """ CPU time in s the stand-ins used so far, 0 where threads cannot be
+        measured one by one.
+        """
+        if not hasattr(time, 'pthread_getcpuclockid'):
+            return 0.0
+        total = -self.plc.callbackTime
+        for ident in self.plc.threads() + [ident for simulator in self.ids for ident in simulator.threads()]:
+            try:
+                total += time.clock_gettime(time.pthread_getcpuclockid(ident))
+            except (OSError, ProcessLookupError):
+                # The thread has ended
+                pass
+        return total
+
+#-----------------------------------------------------------------------------------------------#
+# Acquisition paths, each returns the sample times, the 206/207 skew (or None) and the displacements of 206
+
+def runStiff(standIns, duration, folder):
+    plc = standIns.plc.connect()
+    # SampleDrain reads concurrently with the loop, pyads on Linux needs a connection per thread for that
+    drainConnection = standIns.plc.connect()
+    # and so does the timer that ends the test
+    control = standIns.plc.connect()
+    dev206, dev207 = standIns.device(0), standIns.device(1)
+    control.write_by_name('MAIN.tglStiffness', True, pyads.PLCTYPE_BOOL)
+    # The readout records until PyLoadBusy falls, so it must have risen before and falls after duration
+    while not control.read_by_name('MAIN.PyLoadBusy', pyads.PLCTYPE_BOOL):
+        sleep(0.01)
+    end = threading.Timer(duration, control.write_by_name, ('MAIN.tglStiffness', False, pyads.PLCTYPE_BOOL))
+    end.start()
+    try:
+        fullFileName = AttoCube_LC_Readout_Stiff.acquire(plc, dev206, dev207, drainPlc=drainConnection,
+                                                         pathName=folder)
+    finally:
+        end.cancel()
+        end.join()
+        for connection in (plc, drainConnection, control, dev206, dev207):
+            connection.close()
+    columns = readRecording(fullFileName[:-4] + RECORDING_EXTENSION)
+    paths = np.column_stack([columns[field] for field in AttoCube_LC_Readout_Stiff.fieldnames[3:6]])
+    return columns['Seconds'], columns['207 Seconds'] - columns['206 Seconds'], paths
+
+def runPosRep(standIns, duration, folder):
+    plc = standIns.plc.connect()
+    dev206, dev207 = standIns.device(0), standIns.device(1)
+    first = [len(simulator.stamps) for simulator in standIns.ids]
+    sp = plc.read_by_name('GVL_TS.ActEncCount', pyads.PLCTYPE_ULINT)
+    steps = len(AttoCube_PosRep_Readout_3.steps)
+    try:
+        fullFileName = AttoCube_PosRep_Readout_3.acquire(plc, dev206, dev207, sp, folder, duration / steps)
+    finally:
+        for connection in (plc, dev206, dev207):
+            connection.close()
+    # The CSV starts with four lines about the test before its header
+    with open(fullFileName, newline='') as file:
+        rows = list(csv.DictReader(file.readlines()[4:]))
+    times = np.array([float(row['Seconds']) for row in rows])
+    paths = np.array([[float(row[field]) for field in AttoCube_PosRep_Readout_3.fieldnames[3:5]] for row in rows])
+
+    # Each sample made one request to each AttoCube, in the same order
+    stamps = [np.array(simulator.stamps)[start:] for simulator, start in zip(standIns.ids, first)]
+    count = min(len(stamps[0]), len(stamps[1]))
+    return times, stamps[1][:count] - stamps[0][:count], paths
+
+def runTest(standIns, duration, folder):
+    dev = standIns.device(1)
+    try:
+        data = np.array(test_attocube.acquire(dev, duration))
+    finally:
+        dev.close()
+    return data[:, 0], None, data[:, 1:]
+
+PATHS = {'stiff': runStiff, 'posrep': runPosRep, 'test': runTest}
+
+#-----------------------------------------------------------------------------------------------#
+
+def percentiles(values, scale=1e3):
+    """ PERCENTILES and the maximum of values, in ms by default. """
+    if len(values) == 0:
+        return None
+    result = {'p' + str(p): float(v) * scale for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    result['max'] = float(np.max(values)) * scale
+    return result
+
+def summarize(times, skew, paths, cpu, duration):
+    """ Metrics of one run of a path. """
+    periods = np.diff(times)
+    repeated = np.all(paths[1:] == paths[:-1], axis=1) if len(paths) > 1 else np.zeros(0, dtype=bool)
+    return {'samples': int(len(times)),
+            'samplesPerSecond': len(times) / duration,
+            'periodMs': percentiles(periods),
+            'periodStdMs': float(np.std(periods)) * 1e3 if len(periods) else None,
+            'skewMs': percentiles(np.abs(skew)) if skew is not None else None,
+            'meanSkewMs': float(np.mean(skew)) * 1e3 if skew is not None and len(skew) else None,
+            'repeatedFraction': float(repeated.mean()) if len(repeated) else None,
+            'cpuPerSampleUs': cpu / len(times) * 1e6 if len(times) else None}
+
+def runBenchmark(paths=tuple(PATHS), duration=10.0, latency=0.0, jitter=0.0, rate=10000.0, noise=50.0):
+    """ Runs the paths one after the other against fresh stand-ins.
+
+    Returns
+    -------
+    results : dict
+        settings, platform and the metrics of every path, as stored in the
+        JSON file
+    """
+    results = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+               'platform': platform.platform(), 'python': platform.python_version(),
+               'settings': {'duration': duration, 'latency': latency, 'jitter': jitter, 'rate': rate, 'noise': noise},
+               'paths': {}}
+    with tempfile.TemporaryDirectory() as folder:
+        for name in paths:
+            standIns = StandIns(latency, jitter, rate, noise)
+            standIns.start()
+            try:
+                cpu0 = time.process_time() - standIns.cpuTime()
+                times, skew, displacements = PATHS[name](standIns, duration, folder)
+                cpu = time.process_time() - standIns.cpuTime() - cpu0
+            finally:
+                standIns.stop()
+            results['paths'][name] = summarize(times, skew, displacements, cpu, duration)
+    return results
+
+def flatten(metrics, prefix=''):
+    """ Numeric metrics of a path as {'periodMs.p99': value, ...}. """
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + '.'))
+        elif value is not None:
+            flat[prefix + key] = value
+    return flat
+
+def compare(results, baseline):
+    """ Lines of text with every metric against the baseline. """
+    lines = []
+    for name, metrics in results['paths'].items():
+        if name not in baseline.get('paths', {}):
+            continue
+        old = flatten(baseline['paths'][name])
+        lines.append(name + ' against ' + baseline.get('created', 'baseline') + ':')
+        for key, value in flatten(metrics).items():
+            if key in old:
+                change = (value / old[key] - 1) * 100 if old[key] else float('nan')
+                lines.append('    %-24s %12.4g  was %12.4g  %+7.1f%%' % (key, value, old[key], change))
+    return lines
+
+def report(results):
+    """ Lines of text with the metrics of every path. """
+    lines = []
+    for name, metrics in results['paths'].items():
+        lines.append('%s: %.1f samples/s, %d samples' % (name, metrics['samplesPerSecond'], metrics['samples']))
+        for key in ('periodMs', 'skewMs'):
+            if metrics[key] is not None:
+                lines.append('    %-8s ' % key + '  '.join('%s %.3f' % item for item in metrics[key].items()))
+        if metrics['repeatedFraction'] is not None:
+            lines.append('    repeated readings %.1f%%' % (metrics['repeatedFraction'] * 100))
+        if metrics['cpuPerSampleUs'] is not None:
+            lines.append('    CPU per sample %.1f us' % metrics['cpuPerSampleUs'])
+    return lines
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the acquisition paths against local IDS and PLC stand-ins.")
+    parser.add_argument('--paths', nargs='+', choices=list(PATHS), default=list(PATHS))
+    parser.add_argument('--duration', type=float, default=10.0, help="s per path")
+    parser.add_argument('--latency', type=float, default=0.0, help="IDS request latency in s")
+    parser.add_argument('--jitter', type=float, default=0.0, help="standard deviation of the IDS latency in s")
+    parser.add_argument('--rate', type=float, default=10000.0, help="IDS displacement updates per second")
+    parser.add_argument('--noise', type=float, default=50.0, help="IDS displacement noise in pm")
+    parser.add_argument('--output', help="JSON file of the results, default benchmark_<date>_<time>.json")
+    parser.add_argument('--baseline', help="JSON file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    results = runBenchmark(args.paths, args.duration, args.latency, args.jitter, args.rate, args.noise)
+    print('\n'.join(report(results)))
+    if args.baseline:
+        with open(args.baseline) as file:
+            print('\n'.join(compare(results, json.load(file))))
+    output = args.output or datetime.datetime.now().strftime('benchmark_%Y%m%d_%Hh%Mm%S.json')
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=4)
+    print("Wrote " + output)
@@ -5,57 +5,21 @@
 than data column names in header for tool to work
     -Other Python programs written for thermometry work may need some code changes to conform to standard
     data structure so all tools can function together (to-do)
+-Headless batch mode: python CSV_Data_Grapher.py <folder or CSV or wildcard> ... [--workers N] [--force]
+    -Graphs every run given (every CSV or .npyc recording of a folder) in parallel, one file per process, picking the
+    files the same way as Report.py
+    -Skips a CSV whose PDF is newer than it, so rerunning only graphs new or changed runs; --force graphs all
 
 Created on Fri Jul 30 11:08:27 2023
 
 @author: aeverman
 """
 
+import argparse
+import os
+import sys
 import pandas as pd
-from matplotlib import pyplot as plt
-import PySimpleGUI as sg
-from matplotlib.backends.backend_pdf import PdfPages
-import numpy as np
-
-#-----------------------------------------------------------------------------------------------#
-
-def save_image(filename):
-    
-    # PdfPages is a wrapper around pdf 
-    # file so there is no clash and create
-    # files with no error.
-    p = PdfPages(filename)
-      
-    # get_fignums Return list of existing 
-    # figure numbers
-    fig_nums = plt.get_fignums()  
-    figs = [plt.figure(n) for n in fig_nums]
-      
-    # iterating over the numbers in list
-    for fig in figs: 
-        
-        # and saving the files
-        fig.savefig(p, format='pdf') 
-      
-    # close the object
-    p.close()  
-    
-#-----------------------------------------------------------------------------------------------#
-
-sg.theme("DarkTeal2")
-layout = [[sg.T("")], [sg.Text("Choose a file: "), sg.Input(), sg.FileBrowse(key="-IN-")],[sg.Button("Submit")]]
-
-# Building Window
-window = sg.Window('My File Browser', layout, size=(600,150))
-    
-while True:
-    event, values = window.read()
-    if event == sg.WIN_CLOSED or event=="Exit":
-        break
-    elif event == "Submit":
-        fullFileName = values["-IN-"]
-
-fullFileNamePDF = fullFileName[:-4] + ".pdf"
+from Report import renderReport, renderFiles, reportName, findRuns, STIFFNESS_PLOTS
 
 fieldnames = ['Index',
               'Seconds',
@@ -91,104 +55,70 @@ fieldnames = ['Index',
               'SA LC [N]',
               'Setpoint [N]']
 
-df = pd.read_csv(fullFileName, usecols=fieldnames)
-
-# Set the figure size
-plt.rcParams["figure.figsize"] = [14.00, 7.00]
-plt.rcParams["figure.autolayout"] = True
-fullFileNamePDF = fullFileName[:-4] + ".pdf"
-
-print(min(df['Atto Avg. [uM]']))
-print(max(df['Atto Avg. [uM]']))
-
-df.plot(x=9, y=14, legend=False, xlabel="Attocube Avg. [um]", ylabel="Loadcell [N]", label="Attocube Results")
-m, b = np.polyfit(df['Atto Avg. [uM]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.1f}x {b:+.1f}')
-plt.xlim((min(df['Atto Avg. [uM]'])), (max(df['Atto Avg. [uM]'])))
-#plt.xlim((min(df['Atto Avg. [uM]']) + 0.1*(min(df['Atto Avg. [uM]'])), (max(df['Atto Avg. [uM]'])) + 0.1*(max(df['Atto Avg. [uM]']))))
-plt.ylim((min(df['loadCell [N]']) + 0.3*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.3*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=11, y=14, legend=False, xlabel="Actuator [mm]", ylabel="Loadcell [N]", label="Actuator Results")
-m, b = np.polyfit(df['engAct [mm]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['engAct [mm]'])), (max(df['engAct [mm]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=13, y=14, legend=False, xlabel="Mirror [um]", ylabel="Loadcell [N]", label="Mirror Results")
-m, b = np.polyfit(df['engMir [mm]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['engMir [mm]'])), (max(df['engMir [mm]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=24, y=14, legend=False, xlabel="BWY [mm]", ylabel="Loadcell [N]", label="BWY Results")
-m, b = np.polyfit(df['BWY [mm]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['BWY [mm]'])), (max(df['BWY [mm]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=25, y=14, legend=False, xlabel="Atto X Displacement [uM]", ylabel="Loadcell [N]", label="Atto X")
-m, b = np.polyfit(df['AttoX [uM]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoX [uM]'])), (max(df['AttoX [uM]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=26, y=14, legend=False, xlabel="Atto Y Displacement [uM]", ylabel="Loadcell [N]", label="Atto Y")
-m, b = np.polyfit(df['AttoY [uM]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoY [uM]'])), (max(df['AttoY [uM]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
-
-df.plot(x=27, y=14, legend=False, xlabel="Atto Z Displacement [uM]", ylabel="Loadcell [N]", label="Atto Z")
-m, b = np.polyfit(df['AttoZ [uM]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoZ [uM]'])), (max(df['AttoZ [uM]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
+#-----------------------------------------------------------------------------------------------#
 
-df.plot(x=28, y=14, legend=False, xlabel="Atto X Rotation [uRad]", ylabel="Loadcell [N]", label="Atto RotX")
-m, b = np.polyfit(df['AttoRotX [uRad]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoRotX [uRad]'])), (max(df['AttoRotX [uRad]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
+def choose_file():
+    
+    # Ask for one CSV with a file browser; returns None if the window is closed without Submit
+    import PySimpleGUI as sg
+    sg.theme("DarkTeal2")
+    layout = [[sg.T("")], [sg.Text("Choose a file: "), sg.Input(), sg.FileBrowse(key="-IN-")],[sg.Button("Submit")]]
+    
+    # Building Window
+    window = sg.Window('My File Browser', layout, size=(600,150))
+    
+    fullFileName = None
+    while True:
+        event, values = window.read()
+        if event == sg.WIN_CLOSED or event=="Exit":
+            break
+        elif event == "Submit":
+            fullFileName = values["-IN-"]
+            break
+    window.close()
+    return fullFileName
+
+def graph_file(fullFileName):
+    
+    df = pd.read_csv(fullFileName, usecols=fieldnames)
+    
+    fullFileNamePDF = fullFileName[:-4] + ".pdf"
+    
+    # Plot the load against every channel with its fit and save the pages to a multi-page PDF
+    renderReport(df, fullFileNamePDF, STIFFNESS_PLOTS)
 
-df.plot(x=29, y=14, legend=False, xlabel="Atto Y Rotation [uRad]", ylabel="Loadcell [N]", label="Atto RotY")
-m, b = np.polyfit(df['AttoRotY [uRad]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoRotY [uRad]'])), (max(df['AttoRotY [uRad]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
+def is_up_to_date(fullFileName):
+    
+    # The PDF of a CSV is up to date if it was written after the CSV
+    fullFileNamePDF = reportName(fullFileName)
+    return os.path.isfile(fullFileNamePDF) and os.path.getmtime(fullFileNamePDF) > os.path.getmtime(fullFileName)
 
-df.plot(x=30, y=14, legend=False, xlabel="Atto Z Rotation [uRad]", ylabel="Loadcell [N]", label="Atto RotZ")
-m, b = np.polyfit(df['AttoRotZ [uRad]'], df['loadCell [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['AttoRotZ [uRad]'])), (max(df['AttoRotZ [uRad]'])))
-plt.ylim((min(df['loadCell [N]']) + 0.1*min(df['loadCell [N]'])), (max(df['loadCell [N]']) + 0.1*max(df['loadCell [N]'])))
-plt.legend()
-plt.Figure()
+def graph_batch(paths, workers=None, force=False):
+    
+    fileNames = findRuns(paths)
+    todo = [fileName for fileName in fileNames if force or not is_up_to_date(fileName)]
+    print(str(len(todo)) + " of " + str(len(fileNames)) + " files to graph")
+    failed = 0
+    for fileName, result in renderFiles(todo, workers):
+        if isinstance(result, Exception):
+            failed += 1
+            print("FAILED " + fileName + ": " + str(result))
+        else:
+            print("Wrote " + result)
+    return failed
 
-df.plot(x=32, y=31, legend=False, xlabel="SA Setpoint [N]", ylabel="SA LC [N]", label="SA LC")
-m, b = np.polyfit(df['Setpoint [N]'], df['SA LC [N]'], deg=1)
-plt.axline(xy1=(0, b), slope=m, color="red", label=f'y = {m:.4f}x {b:+.4f}')
-plt.xlim((min(df['Setpoint [N]'])), (max(df['Setpoint [N]'])))
-plt.ylim((min(df['SA LC [N]']) + 0.1*min(df['SA LC [N]'])), (max(df['SA LC [N]']) + 0.1*max(df['SA LC [N]'])))
-plt.legend()
-plt.Figure()
+#-----------------------------------------------------------------------------------------------#
 
-# Save to multi-page PDF
-save_image(fullFileNamePDF)
\ No newline at end of file
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Graphs stiffness CSVs to PDF. Without arguments a file browser opens.")
+    parser.add_argument('paths', nargs='*', help="folders, CSVs or wildcards to graph headless")
+    parser.add_argument('--workers', type=int, default=None, help="processes, default one per CPU")
+    parser.add_argument('--force', action='store_true', help="graph files whose PDF is already up to date")
+    args = parser.parse_args()
+    
+    if args.paths:
+        sys.exit(1 if graph_batch(args.paths, args.workers, args.force) else 0)
+    
+    fullFileName = choose_file()
+    if fullFileName:
+        graph_file(fullFileName)
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Least-squares fit of the Jacobian J from recorded runs.
+
+Each pose column is fitted against the six optical paths plus an offset:
+    pose = paths . J * POSE_SCALE + offset
+The fit keeps only the normal equations (7x7 and 7xk sums), which are added
+up chunk by chunk, so recordings of any length are never held in memory.
+Runs may be CSVs (read in chunks with pandas) or .npyc recordings.
+
+Usage
+-----
+    python Calibrate.py run1.csv run2.npyc ... [options]
+
+    --target POSE=COLUMN    fit the pose column POSE against the reference
+                            column COLUMN of the runs, times --scale. Pose
+                            columns without a target keep the J of the base
+                            calibration. At least one --target or --check is
+                            needed.
+    --check                 self-check instead of a calibration: fit every
+                            pose column of the runs against itself, which
+                            only shows whether the J they were recorded with
+                            is consistent; it cannot be saved
+    --scale FACTOR          factor of the target columns to the pose units
+    --hardpoint NAME        hardpoint of the base calibration and of --save
+    --serials SN206 SN207   IDS serial numbers of the base calibration and of
+                            --save
+    --save                  store the fitted J in the calibration store
+
+The runs must have all six optical paths (206Ch1-3, 207Ch1-3) and the
+target columns; runs of the LC readout, with two channels per IDS, cannot
+be used. They are checked before anything is read or written.
+
+Prints the condition number of the fit, the RMS and largest residual of
+every fitted column and the fitted J.
+"""
+
+import argparse
+import glob
+import numpy as np
+from Calibration import CalibrationStore
+from Pose import POSE_FIELDS, POSE_SCALE
+from Recording import RECORDING_EXTENSION, iterRecording
+
+# Optical path columns of the recordings, in the row order of J
+PATH_FIELDS = ['206Ch1 [pM]', '206Ch2 [pM]', '206Ch3 [pM]', '207Ch1 [pM]', '207Ch2 [pM]', '207Ch3 [pM]']
+
+CHUNK_SIZE = 100000
+
+class NormalEquations(object):
+    """ Incremental least-squares fit of targets against the optical paths
+    with an offset, from the accumulated sums A'A, A'Y and Y'Y.
+
+    Parameters
+    ----------
+    targets : int
+        number of columns fitted
+    """
+
+    def __init__(self, targets):
+        self.AtA = np.zeros((7, 7))
+        self.AtY = np.zeros((7, targets))
+        self.YtY = np.zeros(targets)
+        self.count = 0
+
+    def add(self, paths, targets):
+        """ Adds a chunk of samples.
+
+        Parameters
+        ----------
+        paths : numpy.ndarray
+            optical paths in pm, shape (n, 6)
+        targets : numpy.ndarray
+            reference values, shape (n, targets)
+        """
+        A = np.hstack((np.asarray(paths, dtype=float), np.ones((len(paths), 1))))
+        Y = np.asarray(targets, dtype=float)
+        self.AtA += A.T @ A
+        self.AtY += A.T @ Y
+        self.YtY += np.einsum('ij,ij->j', Y, Y)
+        self.count += len(A)
+
+    def solve(self):
+        """ Solves the normal equations.
+
+        Returns
+        -------
+        coefficients : numpy.ndarray
+            shape (7, targets), rows are the six optical paths and the offset
+        condition : float
+            condition number of the column-equilibrated design matrix
+        """
+        # Equilibrate the columns, the paths are in pm and the offset column is 1
+        scale = np.sqrt(np.diag(self.AtA))
+        scale[scale == 0] = 1.0
+        M = self.AtA / np.outer(scale, scale)
+        singular = np.linalg.eigvalsh(M)
+        condition = np.sqrt(singular[-1] / singular[0]) if singular[0] > 0 else np.inf
+        coefficients = np.linalg.lstsq(M, self.AtY / scale[:, None], rcond=None)[0] / scale[:, None]
+        return coefficients, condition
+
+    def rms(self, coefficients):
+        """ RMS residual of every target, from the sums alone. """
+        rss = (self.YtY - 2 * np.einsum('ij,ij->j', coefficients, self.AtY)
+               + np.einsum('ij,ik,kj->j', coefficients, self.AtA, coefficients))
+        return np.sqrt(np.maximum(rss, 0) / max(self.count, 1))
+
+def runColumns(fileName):
+    """ Column names of a recorded run, from the CSV header or the .npyc
+    header array.
+    """
+    if fileName.endswith(RECORDING_EXTENSION):
+        with open(fileName, 'rb') as file:
+            return [str(name) for name in np.load(file)]
+    import pandas as pd
+    return list(pd.read_csv(fileName, nrows=0).columns)
+
+def checkRuns(fileNames, columns):
+    """ Raises ValueError naming every run that lacks some of columns. """
+    problems = []
+    for fileName in fileNames:
+        present = set(runColumns(fileName))
+        missing = [column for column in columns if column not in present]
+        if missing:
+            problems.append(fileName + " has no " + ", ".join(missing))
+    if problems:
+        raise ValueError("Runs without the columns of the fit (J needs the six optical paths 206Ch1-3 and "
+                         "207Ch1-3):\n" + "\n".join(problems))
+
+def iterRun(fileName, columns, chunkSize=CHUNK_SIZE):
+    """ Yields the given columns of a recorded run chunk by chunk as an array
+    of shape (n, len(columns)).
+    """
+    if fileName.endswith(RECORDING_EXTENSION):
+        for chunk in iterRecording(fileName):
+            yield np.column_stack([chunk[column] for column in columns])
+    else:
+        import pandas as pd
+        for chunk in pd.read_csv(fileName, usecols=columns, chunksize=chunkSize):
+            yield chunk[columns].to_numpy(dtype=float)
+
+def fitJacobian(fileNames, targets, scale=1.0, baseJ=None):
+    """ Fits J over all samples of the runs, two passes over the data: one
+    for the normal equations, one for the largest residuals.
+
+    Parameters
+    ----------
+    fileNames : list
+        CSV or .npyc runs
+    targets : dict
+        reference column of the runs for each fitted pose column
+    scale : float
+        factor of the reference columns to the pose units
+    baseJ : numpy.ndarray
+        J whose columns are kept for the pose columns not fitted
+
+    Returns
+    -------
+    J : numpy.ndarray
+        6x6 fitted J
+    report : dict
+        samples, condition, offset, rms and max residual per fitted column
+    """
+    fitted = [name for name in POSE_FIELDS if name in targets]
+    columns = PATH_FIELDS + [targets[name] for name in fitted]
+    checkRuns(fileNames, columns)
+    normal = NormalEquations(len(fitted))
+    for fileName in fileNames:
+        for chunk in iterRun(fileName, columns):
+            normal.add(chunk[:, :6], chunk[:, 6:] * scale)
+    if normal.count < 7:
+        raise ValueError("Not enough samples to fit J: " + str(normal.count))
+    coefficients, condition = normal.solve()
+
+    maxResidual = np.zeros(len(fitted))
+    for fileName in fileNames:
+        for chunk in iterRun(fileName, columns):
+            residual = chunk[:, 6:] * scale - chunk[:, :6] @ coefficients[:6] - coefficients[6]
+            maxResidual = np.maximum(maxResidual, np.abs(residual).max(axis=0))
+
+    J = np.array(baseJ, dtype=float) if baseJ is not None else np.zeros((6, 6))
+    for k, name in enumerate(fitted):
+        J[:, POSE_FIELDS.index(name)] = coefficients[:6, k] / POSE_SCALE
+    rms = normal.rms(coefficients)
+    report = {'samples': normal.count, 'condition': condition,
+              'columns': {name: {'offset': coefficients[6, k], 'rms': rms[k], 'max': maxResidual[k]}
+                          for k, name in enumerate(fitted)}}
+    return J, report
+
+def parseTargets(targets, check=False):
+    if check:
+        return {name: name for name in POSE_FIELDS}
+    mapping = {}
+    for target in targets:
+        name, _, column = target.partition('=')
+        if name not in POSE_FIELDS or not column:
+            raise SystemExit("--target must be POSE=COLUMN with POSE one of " + ", ".join(POSE_FIELDS))
+        mapping[name] = column
+    return mapping
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Least-squares fit of the AttoCube Jacobian J from recorded runs.")
+    parser.add_argument('runs', nargs='+', help="CSV or " + RECORDING_EXTENSION + " runs, wildcards allowed")
+    parser.add_argument('--target', action='append', default=[], metavar='POSE=COLUMN')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--hardpoint', default='')
+    parser.add_argument('--serials', nargs=2, default=[], metavar=('SN206', 'SN207'))
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--save', action='store_true')
+    args = parser.parse_args()
+    if args.check == bool(args.target):
+        parser.error("give either --target POSE=COLUMN or --check")
+    if args.save and args.check:
+        parser.error("a --check fit of the pose against itself cannot be saved")
+    if args.save and not args.hardpoint:
+        parser.error("--save needs --hardpoint")
+
+    fileNames = sorted(fileName for pattern in args.runs for fileName in (glob.glob(pattern) or [pattern]))
+    targets = parseTargets(args.target, args.check)
+    # Before anything is fitted or saved
+    try:
+        checkRuns(fileNames, PATH_FIELDS + list(targets.values()))
+    except (ValueError, OSError) as e:
+        parser.exit(1, str(e) + "\n")
+    store = CalibrationStore()
+    base = store.load(args.hardpoint, args.serials)
+    J, report = fitJacobian(fileNames, targets, args.scale, base.J)
+
+    if args.check:
+        print("Self-check of the pose columns against themselves, not a calibration")
+    print("Base calibration: " + base.name)
+    print("Samples: " + str(report['samples']) + " from " + str(len(fileNames)) + " runs")
+    print("Condition number: %.3g" % report['condition'])
+    for name, column in report['columns'].items():
+        print("%-16s offset %12.6g  rms %12.6g  max %12.6g" % (name, column['offset'], column['rms'], column['max']))
+    print("J =")
+    print(np.array2string(J, precision=4, suppress_small=True))
+
+    if args.save:
+        calibration = store.save(args.hardpoint, args.serials, J, source="fit of " + ", ".join(fileNames))
+        print("Saved calibration " + calibration.name)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Store of the Jacobian calibrations that convert the AttoCube optical paths
+to the pose of a hardpoint.
+
+A calibration belongs to one hardpoint (MAIN.sSelHPT) measured by one pair
+of IDS (their serial numbers, 206 first). Each one is kept in its own .npz
+file in CALIBRATION_DIR together with its pseudo-inverse and the scaled
+matrix PoseTransform uses, so loading one never computes anything. When no
+calibration was stored for a hardpoint, the default one made from DEFAULT_J
+is used; it is built in memory, and the store is only written by save().
+
+Every run should record which calibration it used, see Calibration.record().
+"""
+
+import datetime
+import json
+import os
+import re
+import numpy as np
+from Pose import POSE_SCALE, PoseTransform
+
+CALIBRATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Calibrations')
+
+# The matrix the readout scripts had built in, used when a hardpoint has no calibration of its own
+DEFAULT_J = np.array([[-0.0931,    0.4916,   -0.8658,   -0.1226,   -0.0119,    0.0064],
+                      [-0.1192,    0.4903,   -0.8634,   -0.1223,    0.0193,    0.0278],
+                      [0.1827,    0.6106,   -0.7706,    0.0953,   -0.1074,   -0.0625],
+                      [0.1964,    0.5962,   -0.7784,    0.0719,   -0.1225,   -0.0757],
+                      [-0.1134,   -0.0576,   -0.9919,    0.0931,    0.1340,   -0.0184],
+                      [-0.1281,   -0.0835,   -0.9882,    0.0619,    0.1513,   -0.0208]])
+
+DEFAULT_NAME = 'default'
+
+def calibrationData(hardpoint, serials, J, source='', created=None):
+    """ Fields of a calibration as stored in its .npz file; created is now
+    if not given.
+    """
+    J = np.array(J, dtype=float)
+    if J.shape != (6, 6):
+        raise ValueError("J must be 6x6, got " + str(J.shape))
+    if created is None:
+        created = datetime.datetime.now().isoformat(timespec='seconds')
+    return {'hardpoint': np.array(hardpoint), 'serials': np.array(list(serials), dtype=str),
+            'J': J, 'pinv': np.linalg.pinv(J), 'scaled': J * POSE_SCALE,
+            'created': np.array(created), 'source': np.array(source)}
+
+class Calibration(object):
+    """ One stored calibration.
+
+    Attributes
+    ----------
+    name : str
+        file name in the store without .npz
+    hardpoint : str
+        MAIN.sSelHPT the calibration was made for, '' for the default
+    serials : list
+        IDS serial numbers, 206 first, empty for the default
+    J : numpy.ndarray
+        6x6 optical paths (pm) to pose
+    pinv : numpy.ndarray
+        pseudo-inverse of J, pose to optical paths
+    scaled : numpy.ndarray
+        J with POSE_SCALE folded in, pm to um/urad
+    created : str
+        ISO time the calibration was stored
+    source : str
+        where J came from, e.g. the runs it was fitted to
+    """
+
+    def __init__(self, name, data):
+        self.name = name
+        self.hardpoint = str(data['hardpoint'])
+        self.serials = [str(serial) for serial in data['serials']]
+        self.J = data['J']
+        self.pinv = data['pinv']
+        self.scaled = data['scaled']
+        self.created = str(data['created'])
+        self.source = str(data['source'])
+
+    def pose(self):
+        """ PoseTransform with the stored scaled matrix. """
+        return PoseTransform(self.J, matrix=self.scaled)
+
+    def describe(self):
+        return {'name': self.name, 'hardpoint': self.hardpoint, 'serials': self.serials,
+                'created': self.created, 'source': self.source, 'J': self.J.tolist()}
+
+    def record(self, fileName):
+        """ Writes which calibration a run used to a JSON file, e.g. next to
+        the run's data file.
+        """
+        with open(fileName, 'w') as file:
+            json.dump(self.describe(), file, indent=4)
+
+class CalibrationStore(object):
+    """ Calibrations on disk, keyed by hardpoint and IDS serial numbers.
+
+    Parameters
+    ----------
+    directory : str
+        folder of the .npz files, created when the first one is saved
+    """
+
+    def __init__(self, directory=CALIBRATION_DIR):
+        self.directory = directory
+
+    def key(self, hardpoint, serials):
+        """ File name of the calibration of hardpoint measured by serials. """
+        key = '_'.join([hardpoint.strip()] + [serial.strip() for serial in serials])
+        return re.sub(r'[^A-Za-z0-9.-]+', '-', key)
+
+    def path(self, name):
+        return os.path.join(self.directory, name + '.npz')
+
+    def save(self, hardpoint, serials, J, source='', name=None):
+        """ Stores J for hardpoint and serials, replacing an older calibration.
+
+        Returns
+        -------
+        calibration : Calibration
+        """
+        data = calibrationData(hardpoint, serials, J, source)
+        if name is None:
+            name = self.key(hardpoint, serials)
+        os.makedirs(self.directory, exist_ok=True)
+        np.savez(self.path(name), **data)
+        return Calibration(name, data)
+
+    def read(self, name):
+        with np.load(self.path(name)) as data:
+            return Calibration(name, {field: data[field] for field in data.files})
+
+    def names(self):
+        """ Names of all stored calibrations. """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(fileName[:-4] for fileName in os.listdir(self.directory) if fileName.endswith('.npz'))
+
+    def load(self, hardpoint, serials):
+        """ Calibration of hardpoint measured by serials, or the default one
+        if none was stored. Never writes to the store: without a stored
+        default, the one made from DEFAULT_J is returned.
+
+        Returns
+        -------
+        calibration : Calibration
+        """
+        for name in (self.key(hardpoint, serials), DEFAULT_NAME):
+            if os.path.isfile(self.path(name)):
+                return self.read(name)
+        return Calibration(DEFAULT_NAME, calibrationData('', [], DEFAULT_J, 'built-in matrix of the readout scripts',
+                                                         created=''))
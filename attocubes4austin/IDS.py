@@ -48,6 +48,40 @@ class Device(ACS.Device, System.Device):
         else:
             return True
 
+    def batch(self, calls):
+        """
+            Calls several functions of this class in one JSON-RPC 2.0 batch,
+            i.e. with a single write and a single read on the connection.
+            Each function must send exactly one request.
+            Parameters
+            ----------
+            calls : list
+                (functionName, arg, ...) tuples, e.g.
+                [('getAxesDisplacement',), ('getAxisSignalQuality', 0),
+                 ('ECUgetRefractiveIndex',)]
+            Returns
+            -------
+            results : list
+               return values of the functions in the order of calls
+            """
+        functions = [getattr(self.__class__, call[0]) for call in calls]
+        requests = []
+        for function, call in zip(functions, calls):
+            try:
+                self.replay(function, call[1:], [])
+            except ACS.RequestPending as pending:
+                requests.append((pending.method, pending.params))
+            else:
+                raise ACS.AttoException("%s sends no request" % call[0])
+        responses = self.batchRequest(requests)
+        results = []
+        for function, call, response in zip(functions, calls, responses):
+            try:
+                results.append(self.replay(function, call[1:], [response]))
+            except ACS.RequestPending:
+                raise ACS.AttoException("%s sends more than one request and cannot be batched" % call[0])
+        return results
+
 
 
     ############################ System functions IDS specific ################################
@@ -1046,6 +1080,93 @@ class Device(ACS.Device, System.Device):
         self.handleError(response)
         return response['result'][1], response['result'][2], response['result'][3]
 
+    def sendAxesDisplacementRequest(self):
+        """
+            Sends the request of getAxesDisplacement without waiting for the
+            reply. Use together with readAxesDisplacement to keep requests to
+            more than one device in flight at the same time.
+        Parameters
+        ----------
+        Returns
+        -------
+        id : int
+            request id to be passed to readAxesDisplacement
+        """
+        if not self.is_open:
+            raise ACS.AttoException("not connected, use connect()")
+        return self.sendRequest("com.attocube.ids.displacement.getAxesDisplacement")
+
+    def readAxesDisplacement(self, request_id):
+        """
+            Collects the reply of sendAxesDisplacementRequest.
+        Parameters
+        ----------
+        request_id : int
+            request id returned by sendAxesDisplacementRequest
+        Returns
+        -------
+        Displacement0 : int
+            displacement of the axis 0 in pm
+        Displacement1 : int
+            displacement of the axis 1 in pm
+        Displacement2 : int
+            displacement of the axis 2 in pm
+        """
+        response = self.getResponse(request_id)
+        self.handleError(response)
+        return response['result'][1], response['result'][2], response['result'][3]
+
+    def sendAxisDisplacementRequests(self, axisNumbers=(0, 1, 2)):
+        """
+            Sends the displacement requests of several axes without waiting
+            for the replies. Use together with readAxisDisplacements to keep
+            requests to more than one device in flight at the same time.
+        Parameters
+        ----------
+        axisNumbers : list
+            Axes to get the relative displacement from {0-2}
+        Returns
+        -------
+        ids : list
+            request ids to be passed to readAxisDisplacements
+        """
+        if not self.is_open:
+            raise ACS.AttoException("not connected, use connect()")
+        return self.sendRequests([("com.attocube.ids.displacement.getAxisDisplacement", [axisNumber])
+                                  for axisNumber in axisNumbers])
+
+    def readAxisDisplacements(self, ids):
+        """
+            Collects the replies of sendAxisDisplacementRequests.
+        Parameters
+        ----------
+        ids : list
+            request ids returned by sendAxisDisplacementRequests
+        Returns
+        -------
+        displacements : list
+            Displacement of each requested axis in pm
+        """
+        responses = self.getResponses(ids)
+        for response in responses:
+            self.handleError(response)
+        return [response['result'][1] for response in responses]
+
+    def getAxisDisplacements(self, axisNumbers=(0, 1, 2)):
+        """
+            Reads out the displacement values of several axes with pipelined
+            requests, i.e. in a single network round trip.
+        Parameters
+        ----------
+        axisNumbers : list
+            Axes to get the relative displacement from {0-2}
+        Returns
+        -------
+        displacements : list
+            Displacement of each requested axis in pm
+        """
+        return self.readAxisDisplacements(self.sendAxisDisplacementRequests(axisNumbers))
+
     def linProc(self, axisNumber, fringesnbr, samplesperfringe, setlinProg):
         """
             Starts linearization procedure.
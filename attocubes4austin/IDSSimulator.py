@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for an attocube IDS3010, to test and benchmark ACS.Device,
+IDS.Device and the acquisition code without the units at
+192.168.88.206/207.
+
+It listens on TCP port 9090 and speaks the same JSON-RPC 2.0 as the device:
+requests arrive as JSON objects (or batch arrays) one after the other, each
+reply is one JSON line ended by CRLF. The methods the driver uses for
+identification, mode handling and displacement readout are implemented;
+other setters are accepted and remembered, so the matching getter returns
+the value set, and any other method returns error 0.
+
+The displacement of each axis is a slow sine with a drift, sampled at the
+update rate of the device (a reading only changes once per update period)
+plus Gaussian noise. Every reply can be delayed by a fixed latency plus a
+random jitter to model the network and the device. The delay runs from the
+arrival of the request, and the replies of one connection are sent in order
+by a thread of their own, so requests in flight together (pipelined, or one
+batch) wait out their latency at the same time, as on the network.
+
+Usage
+-----
+    python IDSSimulator.py [--host 127.0.0.1] [--port 9090] [--rate 10000]
+                           [--noise 50] [--latency 0.0005] [--jitter 0.0002]
+                           [--serial IDS-SIM-206]
+
+or in-process:
+    simulator = Simulator(port=0, latency=0.001)
+    simulator.start()
+    dev = IDS.Device('127.0.0.1')   # with IDS.Device.TCP_PORT = simulator.port
+    ...
+    simulator.stop()
+"""
+
+import argparse
+from collections import deque
+import json
+import math
+import queue
+import socketserver
+import threading
+from time import monotonic, sleep
+import numpy as np
+from Acquisition import AXES
+
+# Mode reported after startMeasurement/startOpticsAlignment until the start-up time has passed
+START_MODES = {'com.attocube.ids.system.startMeasurement': ('measurement starting', 'measurement running'),
+               'com.attocube.ids.system.startOpticsAlignment': ('optics alignment starting', 'optics alignment running')}
+
+class Simulator(object):
+    """ Simulated IDS.
+
+    Parameters
+    ----------
+    host : str
+        address to listen on
+    port : int
+        TCP port, 0 for any free port (see port after start())
+    rate : float
+        displacement updates per second
+    noise : float
+        standard deviation of the displacement noise in pm
+    amplitude : float
+        amplitude of the displacement sine in pm
+    period : float
+        period of the displacement sine in s
+    drift : float
+        displacement drift in pm/s
+    latency : float
+        s from the arrival of a request (or batch) to its reply
+    jitter : float
+        standard deviation in s of a random extra delay
+    startupTime : float
+        s from startMeasurement until 'measurement running'
+    serial : str
+        serial number reported by com.attocube.system.getSerialNumber
+    seed : int
+        seed of the noise
+    """
+
+    def __init__(self, host='127.0.0.1', port=9090, rate=10000.0, noise=50.0, amplitude=1e6, period=20.0, drift=100.0,
+                 latency=0.0, jitter=0.0, startupTime=1.0, serial='IDS-SIM', seed=None):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.noise = noise
+        self.amplitude = amplitude
+        self.period = period
+        self.drift = drift
+        self.latency = latency
+        self.jitter = jitter
+        self.startupTime = startupTime
+        self.serial = serial
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.t0 = monotonic()
+        self.offsets = np.zeros(AXES)
+        # Each axis moves with its own phase, so the axes can be told apart
+        self.phases = np.arange(AXES) * 2 * math.pi / AXES
+        self.sample = None
+        self.sampleIndex = -1
+        self.mode = 'measurement running'
+        self.modeChange = None
+        self.parameters = {}
+        self.requests = 0
+        # When each getAxesDisplacement was answered, to work out the skew between devices
+        self.stamps = deque(maxlen=1 << 20)
+        self.threadIds = set()
+        self.server = None
+        self.thread = None
+
+    #-------------------------------------------------------------------------------------------#
+    # Device model
+
+    def displacements(self):
+        """ Current displacement of every axis in pm, constant within one update period. """
+        with self.lock:
+            index = int((monotonic() - self.t0) * self.rate)
+            if index != self.sampleIndex:
+                t = index / self.rate
+                clean = self.amplitude * np.sin(2 * math.pi * t / self.period + self.phases) + self.drift * t
+                self.sample = clean + self.rng.normal(0.0, self.noise, AXES) if self.noise else clean
+                self.sampleIndex = index
+            return np.rint(self.sample - self.offsets).astype(np.int64)
+
+    def currentMode(self):
+        with self.lock:
+            if self.modeChange is not None and monotonic() >= self.modeChange[0]:
+                self.mode = self.modeChange[1]
+                self.modeChange = None
+            return self.mode
+
+    def setMode(self, mode, later=None):
+        with self.lock:
+            self.mode = mode
+            self.modeChange = (monotonic() + self.startupTime, later) if later else None
+
+    def resetAxes(self, axes):
+        current = self.displacements() + self.offsets.astype(np.int64)
+        with self.lock:
+            for axis in axes:
+                self.offsets[axis] = current[axis]
+
+    def call(self, method, params):
+        """ Result list of one method. """
+        name = method.rsplit('.', 1)[-1]
+        if method == 'com.attocube.ids.displacement.getAxesDisplacement':
+            self.stamps.append(monotonic())
+            return [0] + self.displacements().tolist()
+        if method == 'com.attocube.ids.displacement.getAxisDisplacement':
+            return [0, int(self.displacements()[params[0]])]
+        if method == 'com.attocube.ids.displacement.getAbsolutePositions':
+            return [0] + (self.displacements() + self.offsets.astype(np.int64)).tolist()
+        if method == 'com.attocube.ids.displacement.getAbsolutePosition':
+            return [0, int(self.displacements()[params[0]] + self.offsets[params[0]])]
+        if method == 'com.attocube.ids.system.resetAxes':
+            self.resetAxes(range(AXES))
+            return [0]
+        if method == 'com.attocube.ids.system.resetAxis':
+            self.resetAxes([params[0]])
+            return [0]
+        if method == 'com.attocube.ids.system.getCurrentMode':
+            return [self.currentMode()]
+        if method in START_MODES:
+            self.setMode(*START_MODES[method])
+            return [0]
+        if method in ('com.attocube.ids.system.stopMeasurement', 'com.attocube.ids.system.stopOpticsAlignment'):
+            self.setMode('system idle')
+            return [0]
+        if method == 'com.attocube.ids.system.getFeaturesName':
+            return [0, 'Simulated feature ' + str(params[0])]
+        if method == 'com.attocube.ids.system.getNbrFeaturesActivated':
+            return [1]
+        if method == 'com.attocube.ids.system.getFpgaVersion':
+            return ['SIM-1.0']
+        if method == 'com.attocube.ids.system.getDeviceType':
+            return ['IDS3010 (simulated)']
+        if method == 'com.attocube.system.getSerialNumber':
+            return [self.serial]
+        if method == 'com.attocube.system.getDeviceName':
+            return ['IDS-' + self.serial]
+        if method == 'com.attocube.system.getMacAddress':
+            return ['00:00:00:00:00:00']
+        if method == 'com.attocube.system.getFirmwareVersion':
+            return ['SIM-1.0']
+        if method == 'com.attocube.system.network.getIpAddress':
+            return [self.host]
+        if method in ('com.attocube.system.errorNumberToString', 'com.attocube.system.errorNumberToRecommendation'):
+            return ['Simulated error ' + str(params[-1])]
+        if name.startswith('set'):
+            self.parameters[method.replace('.set', '.get')] = list(params or [])
+            return [0]
+        if method in self.parameters:
+            return self.parameters[method] or [0]
+        return [0, 0, 0, 0]
+
+    def delay(self):
+        """ s from the arrival of a request to its reply. """
+        if not self.jitter:
+            return self.latency
+        with self.lock:
+            return max(0.0, self.latency + self.rng.normal(0.0, self.jitter))
+
+    def respond(self, request):
+        """ JSON-RPC reply to one request object. """
+        self.requests += 1
+        if not isinstance(request, dict) or 'method' not in request:
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'Invalid Request'}}
+        try:
+            result = self.call(request['method'], request.get('params') or [])
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {'code': -32603, 'message': str(e)}}
+        return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+
+    #-------------------------------------------------------------------------------------------#
+    # Server
+
+    def start(self):
+        """ Starts serving on a background thread. """
+        simulator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                simulator.threadIds.add(threading.get_ident())
+                try:
+                    simulator.serve(self.request)
+                finally:
+                    simulator.threadIds.discard(threading.get_ident())
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def threads(self):
+        """ Idents of the threads serving the simulator, to tell their CPU
+        time apart from that of a client in the same process.
+        """
+        return ([self.thread.ident] if self.thread is not None else []) + list(self.threadIds)
+
+    def serve(self, connection):
+        """ Answers the requests of one connection until it closes. The
+        requests carry no delimiter, so they are split by decoding one JSON
+        value after the other from the received text. Each is queued with
+        the time its reply is due for the sender thread of the connection.
+        """
+        pending = queue.Queue()
+        sender = threading.Thread(target=self.send, args=(connection, pending), daemon=True)
+        sender.start()
+        decoder = json.JSONDecoder()
+        text = ''
+        # The device answers in order, so no reply is due before the one of an earlier request
+        due = 0.0
+        try:
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    return
+                arrival = monotonic()
+                text += data.decode()
+                while True:
+                    text = text.lstrip()
+                    try:
+                        request, end = decoder.raw_decode(text)
+                    except ValueError:
+                        # Incomplete, wait for more
+                        break
+                    text = text[end:]
+                    due = max(due, arrival + self.delay())
+                    pending.put((due, request))
+        finally:
+            pending.put(None)
+            sender.join()
+
+    def send(self, connection, pending):
+        """ Sender thread of one connection: answers every queued request
+        once it is due, until serve() queues None.
+        """
+        self.threadIds.add(threading.get_ident())
+        try:
+            while True:
+                entry = pending.get()
+                if entry is None:
+                    return
+                due, request = entry
+                wait = due - monotonic()
+                if wait > 0:
+                    sleep(wait)
+                if isinstance(request, list):
+                    reply = [self.respond(item) for item in request]
+                else:
+                    reply = self.respond(request)
+                try:
+                    connection.sendall((json.dumps(reply) + '\r\n').encode())
+                except OSError:
+                    # The client is gone, serve() ends as well
+                    pass
+        finally:
+            self.threadIds.discard(threading.get_ident())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulated attocube IDS3010 JSON-RPC server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--rate', type=float, default=10000.0, help="displacement updates per second")
+    parser.add_argument('--noise', type=float, default=50.0, help="displacement noise in pm")
+    parser.add_argument('--amplitude', type=float, default=1e6, help="displacement sine amplitude in pm")
+    parser.add_argument('--latency', type=float, default=0.0, help="delay of every reply in s")
+    parser.add_argument('--jitter', type=float, default=0.0, help="standard deviation of an extra delay in s")
+    parser.add_argument('--serial', default='IDS-SIM')
+    args = parser.parse_args()
+
+    simulator = Simulator(args.host, args.port, rate=args.rate, noise=args.noise, amplitude=args.amplitude,
+                          latency=args.latency, jitter=args.jitter, serial=args.serial)
+    simulator.start()
+    print("Simulated IDS listening on " + args.host + ":" + str(simulator.port) + ", Ctrl+C to stop")
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the hardpoint test stand PLC (HPT_PLC), to run and
+benchmark the acquisition code without the test stand.
+
+It is a pyads test server (pyads.testserver.AdsTestServer with its
+AdvancedHandler) that publishes the MAIN.* and GVL_TS.* symbols the readout
+scripts read and write, with their PLC types, so get_symbol, read_by_name,
+write_by_name, SymbolBlock's sum read, device notifications and SampleDrain
+all work against it.
+
+A task thread runs the PLC cycles (1 ms by default) in batches: the cycles
+that are due are worked out together with NumPy and the last one is
+published to the symbols. What the model does mirrors MAIN:
+-tglStiffness/tglBWY run the triangle load of FB_TriForce (Slope cycles per
+quarter, Force/10 N peak) on the load cell, and the actuator and mirror
+encoders follow the load through a spring with hysteresis.
+-tglSAstiffness runs the +-500 N triangle of FB_SAstiffness (1 N every
+SAstep cycles) the same way. MAIN drives no load for tglPyTest, the test
+brings its own; here it gets the FB_SAstiffness triangle too, so the
+stiffness readout has cycles to segment.
+-tglPLoop/btnPyPosRep move the actuator to the counts in MAIN.sSetpoint
+like fbPLOOP.
+-MAIN.PyLoadBusy is set while a test runs, and MAIN.fbSampleBuf records
+every cycle as FB_SampleBuffer does.
+Everything else holds plausible constants with a little noise.
+
+Device notifications are sent every batch of cycles with the cycle's time
+stamp, like ADSTRANS_SERVERCYCLE, and only reach clients in the same
+process, a limitation of the pyads test server. The test server has no
+public way to send them; like its own PLCVariable.write, deliverNotification()
+calls the client callbacks registered in pyads' private callback_store, so
+the simulator is pinned to pyads PYADS_VERSION. The ADS library of pyads on
+Linux handles one request at a time per connection, so threads that read
+concurrently (e.g. SampleDrain) need a connection of their own there.
+
+Usage
+-----
+    python PLCSimulator.py [--ip 127.0.0.1] [--cycle 0.001] [--slope 10000]
+                           [--hardpoint HPT-SIM]
+
+and connect with pyads.Connection(AMS_NET_ID, AMS_PORT, '127.0.0.1'), or
+in-process:
+    simulator = Simulator()
+    simulator.start()
+    plc = simulator.connect()
+    plc.write_by_name('MAIN.tglStiffness', True, pyads.PLCTYPE_BOOL)
+    ...
+    plc.close()
+    simulator.stop()
+"""
+
+import argparse
+import ctypes
+import datetime
+import threading
+from time import monotonic, sleep, thread_time
+import numpy as np
+import pyads
+from pyads.structs import SAdsNotificationHeader
+from pyads.testserver import AdsTestServer, AdvancedHandler, PLCVariable
+from Acquisition import ST_SAMPLE, plcDtype
+
+# pyads release whose private callback_store deliverNotification() relies on
+PYADS_VERSION = '3.6'
+if pyads.__version__.split('.')[:2] != PYADS_VERSION.split('.'):
+    raise ImportError("PLCSimulator needs pyads " + PYADS_VERSION + ".x, found " + pyads.__version__)
+
+AMS_NET_ID = '127.0.0.1.1.1'
+AMS_PORT = 851
+ADS_TCP_PORT = 48898
+
+# Must match SAMPLE_HALF of FB_SampleBuffer
+SAMPLE_HALF = 500
+
+# Peak force in N of FB_SAstiffness
+SA_FORCE = 500
+
+ADS_TYPES = {'BOOL': pyads.constants.ADST_BIT, 'INT': pyads.constants.ADST_INT16, 'DINT': pyads.constants.ADST_INT32,
+             'UDINT': pyads.constants.ADST_UINT32, 'TIME': pyads.constants.ADST_UINT32,
+             'ULINT': pyads.constants.ADST_UINT64, 'REAL': pyads.constants.ADST_REAL32,
+             'LREAL': pyads.constants.ADST_REAL64, 'STRING': pyads.constants.ADST_STRING}
+
+# Symbols of the stand-in and their PLC types
+SYMBOLS = [('GVL_TS.ActEncCount', 'ULINT'), ('GVL_TS.MirEncCount', 'ULINT'), ('GVL_TS.LC_InR', 'REAL'),
+           ('GVL_TS.mtr_pos', 'DINT'),
+           ('MAIN.engActEnc', 'LREAL'), ('MAIN.engMirEnc', 'LREAL'), ('MAIN.mtrRPM', 'LREAL'), ('MAIN.mtrCurrent', 'REAL'),
+           ('MAIN.EncTemp', 'REAL'), ('MAIN.MtrTemp', 'REAL'), ('MAIN.BWYPressPSI', 'REAL'), ('MAIN.FlowRate', 'REAL'),
+           ('MAIN.COARSE_VAL', 'REAL'), ('MAIN.rb_x', 'REAL'), ('MAIN.sp_x', 'REAL'), ('MAIN.TestCycles', 'INT'),
+           ('MAIN.sTime', 'STRING'), ('MAIN.sSelHPT', 'STRING'), ('MAIN.sSetpoint', 'STRING'),
+           ('MAIN.PyLoadBusy', 'BOOL'), ('MAIN.PyEnable', 'BOOL'), ('MAIN.PyHeartbeat', 'UDINT'),
+           ('MAIN.btnPyPosRep', 'BOOL'),
+           ('MAIN.tglStiffness', 'BOOL'), ('MAIN.tglBWY', 'BOOL'), ('MAIN.tglROM', 'BOOL'), ('MAIN.tglSine', 'BOOL'),
+           ('MAIN.tglPLoop', 'BOOL'), ('MAIN.tglSAstiffness', 'BOOL'), ('MAIN.tglPyTest', 'BOOL'),
+           ('MAIN.fbPLOOP.fSetpointValue', 'REAL'), ('MAIN.fbPLOOP.stCTRL_PID_PARAMS.fKp', 'LREAL'),
+           ('MAIN.fbPLOOP.stCTRL_PID_PARAMS.tTn', 'TIME'),
+           ('MAIN.atto1', 'REAL'), ('MAIN.atto2', 'REAL'), ('MAIN.atto3', 'REAL'),
+           ('MAIN.atto4', 'REAL'), ('MAIN.atto5', 'REAL'), ('MAIN.atto6', 'REAL'),
+           ('MAIN.fbSampleBuf.nHalfSize', 'UDINT'), ('MAIN.fbSampleBuf.nHalvesDone', 'UDINT'),
+           ('MAIN.fbSampleBuf.nHalvesRead', 'UDINT'), ('MAIN.fbSampleBuf.nIndex', 'UDINT'),
+           ('MAIN.fbSampleBuf.nOverruns', 'UDINT')]
+
+# Array symbols: element type and length
+ARRAYS = [('MAIN.PyStiffSlope', 'LREAL', 10), ('MAIN.PyStiffIntercept', 'LREAL', 10), ('MAIN.PyStiffR2', 'LREAL', 10)]
+
+# Toggles that start a test, as in MAIN
+TEST_TOGGLES = ['MAIN.tglSAstiffness', 'MAIN.tglStiffness', 'MAIN.tglBWY', 'MAIN.tglROM', 'MAIN.tglSine',
+                'MAIN.tglPLoop', 'MAIN.tglPyTest']
+
+# Seconds from 1601-01-01 to 1970-01-01
+FILETIME_EPOCH = 11644473600
+
+# Scale of the encoders, engActEnc := GVL_TS.ActEncCount * 5E-6
+ENCODER_MM = 5e-6
+
+class Handler(AdvancedHandler):
+    """ AdvancedHandler that also finds variables by the handle index group,
+    which add_device_notification by name uses.
+    """
+
+    def get_variable_by_indices(self, index_group, index_offset):
+        if index_group == pyads.constants.ADSIGRP_SYM_VALBYHND:
+            return self.get_variable_by_handle(index_offset)
+        return AdvancedHandler.get_variable_by_indices(self, index_group, index_offset)
+
+class Variable(PLCVariable):
+    """ PLCVariable that keeps its size when a shorter value (a STRING) is
+    written, and whose notification handles are unique across all variables
+    as the client needs them to be. Notifications are sent by notify() once
+    per PLC cycle, as in ADSTRANS_SERVERCYCLE mode, instead of on writes.
+    """
+
+    def write(self, value, request=None):
+        self.value = value.ljust(len(self.value), b'\0')
+
+    def notify(self, stamp):
+        """ Sends the current value to every notification of the variable.
+
+        Parameters
+        ----------
+        stamp : int
+            FILETIME of the PLC cycle
+        """
+        # The header ends in the first byte of the data, make room for all of it
+        offset = SAdsNotificationHeader.data.offset
+        buffer = ctypes.create_string_buffer(max(ctypes.sizeof(SAdsNotificationHeader), offset + len(self.value)))
+        header = SAdsNotificationHeader.from_buffer(buffer)
+        header.nTimeStamp = stamp
+        header.cbSampleSize = len(self.value)
+        ctypes.memmove(ctypes.addressof(header) + offset, self.value, len(self.value))
+        for handle in self.notifications:
+            header.hNotification = handle
+            deliverNotification(header)
+
+    def register_notification(self):
+        handle = PLCVariable.notification_count
+        PLCVariable.notification_count += 1
+        self.notifications.append(handle)
+        return handle
+
+def deliverNotification(header):
+    """ Calls the client callback of the notification header.hNotification,
+    as pyads.testserver.PLCVariable.write does on a write.
+
+    This is the only use of pyads' private API: the callbacks of the clients
+    in this process are kept in pyads.pyads_ex.callback_store, keyed by
+    (AmsAddr, notification handle), which may change with any pyads release
+    (see PYADS_VERSION).
+
+    Parameters
+    ----------
+    header : pyads.structs.SAdsNotificationHeader
+        notification with its handle, time stamp and data
+    """
+    from pyads.pyads_ex import callback_store
+    for (address, handle), callback in list(callback_store.items()):
+        if handle == header.hNotification:
+            callback(address.amsAddrStruct(), header, 0)
+
+def fileTime(now):
+    """ Windows FILETIME (100 ns since 1601) of a datetime, with the
+    sub-second part that pyads.filetimes drops.
+    """
+    return int(round((now.timestamp() + FILETIME_EPOCH) * 1e7))
+
+def plcTime(now):
+    """ MAIN.sTime as FB_PLCTime formats it, e.g. '9:05:07.42'. """
+    return '%d:%02d:%02d.%d' % (now.hour, now.minute, now.second, now.microsecond // 1000)
+
+class Simulator(object):
+    """ Simulated test stand PLC.
+
+    Parameters
+    ----------
+    ip : str
+        address the ADS server listens on
+    port : int
+        ADS TCP port
+    cycle : float
+        PLC task cycle in s
+    slope : int
+        PLC cycles per quarter of the FB_TriForce load cycle, 10000 in MAIN
+    force : int
+        Force input of fbSTIFF, Force/10 N is the peak load
+    saStep : int
+        PLC cycles per 1 N step of FB_SAstiffness, 50 in the FB
+    stiffness : float
+        hardpoint stiffness in N/um, actuator side
+    mirrorRatio : float
+        mirror encoder travel per actuator travel
+    hysteresis : float
+        um of play between loading and unloading
+    noise : float
+        standard deviation of the load cell noise in N
+    hardpoint : str
+        MAIN.sSelHPT
+    tick : float
+        s between batches of PLC cycles
+    seed : int
+        seed of the noise
+    """
+
+    def __init__(self, ip='127.0.0.1', port=ADS_TCP_PORT, cycle=0.001, slope=10000, force=7500, saStep=50,
+                 stiffness=100.0, mirrorRatio=0.98, hysteresis=0.5, noise=0.2, hardpoint='HPT-SIM', tick=0.005, seed=None):
+        self.ip = ip
+        self.port = port
+        self.cycle = cycle
+        self.slope = slope
+        self.force = force
+        self.saStep = saStep
+        self.stiffness = stiffness
+        self.mirrorRatio = mirrorRatio
+        self.hysteresis = hysteresis
+        self.noise = noise
+        self.tick = tick
+        self.rng = np.random.default_rng(seed)
+        self.handler = Handler()
+        self.variables = {}
+        for name, plcType in SYMBOLS:
+            self.addVariable(name, plcType, ADS_TYPES[plcType], np.zeros(1, plcDtype(plcType)).tobytes())
+        for name, plcType, length in ARRAYS:
+            self.addVariable(name, 'ARRAY [0..%d] OF %s' % (length - 1, plcType), pyads.constants.ADST_BIGTYPE,
+                             np.zeros(length, plcDtype(plcType)).tobytes())
+        halfType = 'ARRAY [0..%d] OF ST_Sample' % (SAMPLE_HALF - 1)
+        self.halves = [np.zeros(SAMPLE_HALF, ST_SAMPLE) for half in range(2)]
+        for name, half in zip(('MAIN.fbSampleBuf.aHalfA', 'MAIN.fbSampleBuf.aHalfB'), self.halves):
+            self.addVariable(name, halfType, pyads.constants.ADST_BIGTYPE, half.tobytes())
+
+        self.set('MAIN.sSelHPT', hardpoint)
+        self.set('MAIN.PyEnable', True)
+        self.set('MAIN.fbPLOOP.stCTRL_PID_PARAMS.fKp', 5000.0)
+        self.set('MAIN.fbSampleBuf.nHalfSize', SAMPLE_HALF)
+        self.set('MAIN.EncTemp', 22.5)
+        self.set('MAIN.MtrTemp', 28.0)
+        self.set('MAIN.FlowRate', 12.0)
+
+        # Model state carried from one batch of cycles to the next
+        self.cycles = 0
+        self.counter = 0
+        self.testCycles = 0
+        self.busy = False
+        self.actuator = 2000000.0
+        self.direction = 1.0
+        self.lastLoad = 0.0
+        self.buffer = {'done': 0, 'index': 0, 'overruns': 0, 'nCycle': 0}
+        # CPU time the clients' notification callbacks took on the task thread
+        self.callbackTime = 0.0
+        self.running = False
+        self.error = None
+        self.thread = None
+        self.server = None
+
+    #-------------------------------------------------------------------------------------------#
+    # Symbols
+
+    def addVariable(self, name, symbolType, adsType, value):
+        variable = Variable(name, value, adsType, symbolType)
+        self.handler.add_variable(variable)
+        self.variables[name] = (variable, symbolType)
+
+    def get(self, name):
+        """ Current value of a symbol. """
+        variable, plcType = self.variables[name]
+        value = np.frombuffer(variable.value, plcDtype(plcType), count=1)[0]
+        return value.split(b'\0', 1)[0].decode() if plcType == 'STRING' else value.item()
+
+    def set(self, name, value):
+        """ Writes a symbol as the PLC would, notifying its subscribers. """
+        variable, plcType = self.variables[name]
+        if plcType == 'STRING':
+            value = value.encode()
+        variable.write(np.array(value, plcDtype(plcType)).tobytes())
+
+    #-------------------------------------------------------------------------------------------#
+    # PLC cycles
+
+    def triangle(self, counters, force):
+        """ Load in N of FB_TriForce at the given counter values. """
+        slope = self.slope
+        quarter = counters // slope
+        ramp = (counters % slope) / slope
+        # Up and back down on channel 2, then the other way on channel 1
+        shape = np.choose(np.minimum(quarter, 4), [ramp, 1 - ramp, -ramp, ramp - 1, np.zeros_like(ramp)])
+        return shape * force / 10
+
+    def saTriangle(self, counters):
+        """ Force in N of FB_SAstiffness at the given counter values, and the
+        extremes reached, which the FB counts as cycles.
+        """
+        steps = counters // self.saStep
+        phase = steps % (4 * SA_FORCE)
+        force = np.where(phase <= SA_FORCE, phase, np.where(phase <= 3 * SA_FORCE, 2 * SA_FORCE - phase,
+                                                            phase - 4 * SA_FORCE))
+        return force.astype(float), int((steps[-1] + SA_FORCE) // (2 * SA_FORCE))
+
+    def run(self, n, now):
+        """ Runs n PLC cycles ending at the wall clock time now. """
+        stiffness = self.get('MAIN.tglStiffness')
+        saStiffness = self.get('MAIN.tglSAstiffness') or self.get('MAIN.tglPyTest')
+        breakaway = self.get('MAIN.tglBWY')
+        positionLoop = self.get('MAIN.tglPLoop') or self.get('MAIN.btnPyPosRep')
+        busy = ((any(self.get(name) for name in TEST_TOGGLES) and self.get('MAIN.PyEnable'))
+                or self.get('MAIN.btnPyPosRep'))
+
+        # fbSTIFF/fbBWY step their counter through 4*Slope+1 values and count the wraps as cycles
+        if stiffness or breakaway:
+            counters = self.counter + np.arange(n)
+            self.testCycles += int(counters[-1] // (4 * self.slope + 1))
+            counters %= 4 * self.slope + 1
+            self.counter = int(counters[-1]) + 1
+            self.set('MAIN.TestCycles', min(self.testCycles, 32767))
+            command = self.triangle(counters, self.force if stiffness else 32767)
+        elif saStiffness:
+            # fbSAstiffness keeps counting up, its cycles are only cleared while the toggle is off
+            counters = self.counter + np.arange(n)
+            self.counter = int(counters[-1]) + 1
+            command, self.testCycles = self.saTriangle(counters)
+            self.set('MAIN.TestCycles', min(self.testCycles, 32767))
+        else:
+            self.counter = 0
+            self.testCycles = 0
+            command = np.zeros(n)
+        load = command + self.rng.normal(0.0, self.noise, n)
+
+        # The hardpoint is a spring with play: the displacement lags by the hysteresis when the load turns
+        change = np.diff(command, prepend=self.lastLoad)
+        direction = np.where(change > 0, 1.0, np.where(change < 0, -1.0, np.nan))
+        direction[0] = self.direction if np.isnan(direction[0]) else direction[0]
+        index = np.maximum.accumulate(np.where(np.isnan(direction), 0, np.arange(n)))
+        direction = direction[index]
+        self.direction = direction[-1]
+        self.lastLoad = command[-1]
+        spring = (command / self.stiffness - direction * self.hysteresis / 2) * 1e-3 / ENCODER_MM
+
+        # fbPLOOP drives the actuator to the setpoint counts with a 50 ms time constant
+        if positionLoop:
+            try:
+                setpoint = float(self.get('MAIN.sSetpoint'))
+            except ValueError:
+                setpoint = 0.0
+            decay = np.exp(-self.cycle * np.arange(1, n + 1) / 0.05)
+            base = setpoint + (self.actuator - setpoint) * decay
+            self.actuator = base[-1]
+        else:
+            setpoint = self.get('MAIN.fbPLOOP.fSetpointValue')
+            base = np.full(n, self.actuator)
+        rpm = np.diff(base, prepend=base[0]) / self.cycle * ENCODER_MM * 60 / 2.0
+
+        actCount = np.rint(base + spring).astype(np.uint64)
+        mirCount = np.rint(base + self.mirrorRatio * spring).astype(np.uint64)
+        records = np.zeros(n, ST_SAMPLE)
+        records['ActEncCount'] = actCount
+        records['engActEnc'] = actCount * ENCODER_MM
+        records['MirEncCount'] = mirCount
+        records['engMirEnc'] = mirCount * ENCODER_MM
+        records['LC_InR'] = load
+        records['mtr_pos'] = np.rint(base / 4).astype(np.int32)
+        records['mtrRPM'] = rpm
+        records['mtrCurrent'] = 0.2 + np.abs(command) * 1e-3
+        records['fSetpointValue'] = setpoint
+        records['rb_x'] = load
+        records['sp_x'] = command
+        records['sTime'] = plcTime(now).encode()
+
+        self.publish(records[-1], busy)
+        self.record(records, busy)
+        stamp = fileTime(now)
+        start = thread_time()
+        for variable, symbolType in self.variables.values():
+            if variable.notifications:
+                variable.notify(stamp)
+        self.callbackTime += thread_time() - start
+
+    def publish(self, last, busy):
+        self.set('GVL_TS.ActEncCount', last['ActEncCount'])
+        self.set('GVL_TS.MirEncCount', last['MirEncCount'])
+        self.set('GVL_TS.LC_InR', last['LC_InR'])
+        self.set('GVL_TS.mtr_pos', last['mtr_pos'])
+        self.set('MAIN.engActEnc', last['engActEnc'])
+        self.set('MAIN.engMirEnc', last['engMirEnc'])
+        self.set('MAIN.COARSE_VAL', last['engMirEnc'] + 0.0005)
+        self.set('MAIN.mtrRPM', last['mtrRPM'])
+        self.set('MAIN.mtrCurrent', last['mtrCurrent'])
+        self.set('MAIN.BWYPressPSI', abs(last['sp_x']) * 0.02)
+        self.set('MAIN.rb_x', last['rb_x'])
+        self.set('MAIN.sp_x', last['sp_x'])
+        self.set('MAIN.fbPLOOP.fSetpointValue', last['fSetpointValue'])
+        self.set('MAIN.sTime', last['sTime'].decode())
+        self.set('MAIN.PyLoadBusy', busy)
+
+    def record(self, records, busy):
+        """ FB_SampleBuffer: the records of every cycle go into the half being
+        filled, state is reset on the rising edge of PyLoadBusy.
+        """
+        state = self.buffer
+        if busy and not self.busy:
+            state.update(done=0, index=0, overruns=0, nCycle=0)
+            self.set('MAIN.fbSampleBuf.nHalvesRead', 0)
+        self.busy = busy
+        if not busy:
+            return
+        records['nCycle'] = state['nCycle'] + np.arange(len(records))
+        state['nCycle'] += len(records)
+        halvesRead = self.get('MAIN.fbSampleBuf.nHalvesRead')
+        start = 0
+        while start < len(records):
+            half = state['done'] % 2
+            count = min(len(records) - start, SAMPLE_HALF - state['index'])
+            self.halves[half][state['index']:state['index'] + count] = records[start:start + count]
+            state['index'] += count
+            start += count
+            if state['index'] >= SAMPLE_HALF or start == len(records):
+                name = 'MAIN.fbSampleBuf.aHalfB' if half else 'MAIN.fbSampleBuf.aHalfA'
+                self.variables[name][0].write(self.halves[half].tobytes())
+            if state['index'] >= SAMPLE_HALF:
+                state['index'] = 0
+                state['done'] += 1
+                if state['done'] > halvesRead + 1:
+                    state['overruns'] += 1
+        self.set('MAIN.fbSampleBuf.nIndex', state['index'])
+        self.set('MAIN.fbSampleBuf.nHalvesDone', state['done'])
+        self.set('MAIN.fbSampleBuf.nOverruns', state['overruns'])
+
+    def task(self):
+        t0 = monotonic()
+        try:
+            while self.running:
+                due = int((monotonic() - t0) / self.cycle) - self.cycles
+                if due > 0:
+                    self.run(due, datetime.datetime.now())
+                    self.cycles += due
+                sleep(self.tick)
+        except Exception as e:
+            self.error = e
+            self.running = False
+
+    #-------------------------------------------------------------------------------------------#
+    # Server
+
+    def start(self):
+        """ Starts the ADS server and the PLC task. """
+        self.server = AdsTestServer(handler=self.handler, ip_address=self.ip, port=self.port, logging=False)
+        self.server.start()
+        self.running = True
+        self.thread = threading.Thread(target=self.task, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+
+    def threads(self):
+        """ Idents of the threads running the simulator, to tell their CPU
+        time apart from that of a client in the same process. Notification
+        callbacks run on the task thread, their CPU time is in callbackTime.
+        """
+        threads = [self.thread] + ([self.server] + self.server.clients if self.server is not None else [])
+        # The clients of closed connections stay listed, and a thread that ended has no CPU clock to ask
+        return [thread.ident for thread in threads if thread is not None and thread.is_alive()]
+
+    def connect(self):
+        """ Opened pyads.Connection to the stand-in. """
+        plc = pyads.Connection(AMS_NET_ID, AMS_PORT, self.ip)
+        plc.open()
+        return plc
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulated hardpoint test stand PLC (ADS).")
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--cycle', type=float, default=0.001, help="PLC task cycle in s")
+    parser.add_argument('--slope', type=int, default=10000, help="PLC cycles per quarter load cycle")
+    parser.add_argument('--hardpoint', default='HPT-SIM', help="MAIN.sSelHPT")
+    args = parser.parse_args()
+
+    simulator = Simulator(args.ip, cycle=args.cycle, slope=args.slope, hardpoint=args.hardpoint)
+    simulator.start()
+    print("Simulated PLC listening on " + args.ip + ", AMS " + AMS_NET_ID + ":" + str(AMS_PORT) + ", Ctrl+C to stop")
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
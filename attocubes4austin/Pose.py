@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Transform of the six AttoCube optical paths to the 6-DOF pose of the
+hardpoint.
+
+The readout scripts multiplied each sample's optical paths with the
+Jacobian J and divided the six results by 1e6 one at a time. PoseTransform
+folds the unit scaling into J once, so a whole block of samples is converted
+with a single matrix multiplication.
+"""
+
+import numpy as np
+
+# Pose columns of the recordings, in the order of the columns of J
+POSE_FIELDS = ['AttoX [uM]', 'AttoY [uM]', 'AttoZ [uM]', 'AttoRotX [uRad]', 'AttoRotY [uRad]', 'AttoRotZ [uRad]']
+
+# pm to um for the translations, and the same 1e-6 for the rotations to come out in urad
+POSE_SCALE = 1e-6
+
+class PoseTransform(object):
+    """ Optical paths to pose, pose = paths . J * POSE_SCALE.
+
+    Parameters
+    ----------
+    J : array_like
+        6x6 Jacobian, rows in the order of readDisplacements() (206 Ch1-3,
+        207 Ch1-3), columns in the order of POSE_FIELDS
+    scale : float
+        unit scaling folded into the matrix
+    matrix : array_like
+        J already scaled, e.g. as stored with a calibration
+    """
+
+    def __init__(self, J, scale=POSE_SCALE, matrix=None):
+        self.J = np.array(J, dtype=float)
+        if self.J.shape != (6, len(POSE_FIELDS)):
+            raise ValueError("J must be 6x6, got " + str(self.J.shape))
+        self.matrix = self.J * scale if matrix is None else np.asarray(matrix)
+
+    def transform(self, optical_paths):
+        """ Converts a block of optical paths.
+
+        Parameters
+        ----------
+        optical_paths : numpy.ndarray
+            displacements in pm, shape (n, 6) or (6,)
+
+        Returns
+        -------
+        pose : numpy.ndarray
+            X, Y, Z in um and RotX, RotY, RotZ in urad, shape (n, 6) or (6,)
+        """
+        return np.matmul(optical_paths, self.matrix)
+
+    def columns(self, optical_paths):
+        """ Converts a block of optical paths into the pose columns of a
+        recording.
+
+        Returns
+        -------
+        columns : dict
+            array of n values for each of POSE_FIELDS
+        """
+        pose = self.transform(optical_paths)
+        return {name: pose[:, k] for k, name in enumerate(POSE_FIELDS)}
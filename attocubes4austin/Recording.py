@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Binary columnar recording of the readout data.
+
+The readout scripts used to format every sample into a CSV row while the
+test was running. A Recorder instead copies whole blocks of samples into
+preallocated NumPy columns and writes a full block to disk as raw .npy
+arrays, so no number is turned into text during acquisition. exportCSV()
+writes the usual CSV afterwards. A BackgroundWriter moves the writing onto
+its own thread behind a bounded queue, so a disk stall does not hold up the
+acquisition loop.
+
+File layout (.npyc)
+-------------------
+A plain sequence of arrays as written by numpy.save(), read back with
+repeated numpy.load() on the same open file:
+    1. header: 1-D unicode array of the column names, in CSV column order
+    2. one chunk per flushed block: one 1-D array per column, in header
+       order, all of the same length
+A chunk is only written complete, so a file cut short by a crash is readable
+up to its last full chunk.
+
+Usage
+-----
+    python Recording.py <file>.npyc [<file>.csv]
+exports a recording to CSV, by default next to it with the same name.
+"""
+
+import csv
+import queue
+import sys
+import threading
+import numpy as np
+
+RECORDING_EXTENSION = '.npyc'
+
+class Recorder(object):
+    """ Appends blocks of samples to preallocated columns and flushes them
+    to a .npyc file, used like csv.DictWriter.
+
+    Parameters
+    ----------
+    file : file
+        .npyc file opened with 'wb'
+    columns : list
+        column names, e.g. the scripts' fieldnames
+    blockSize : int
+        samples per column block and per chunk on disk
+    """
+
+    def __init__(self, file, columns, blockSize=4096):
+        self.file = file
+        self.columns = list(columns)
+        self.blockSize = blockSize
+        # The column dtypes are taken from the first appended block
+        self.block = None
+        self.count = 0
+        self.samples = 0
+        np.save(self.file, np.array(self.columns))
+
+    def append(self, values):
+        """ Appends n samples.
+
+        Parameters
+        ----------
+        values : dict
+            array of n values for every column, or a single value that all
+            n samples share
+        """
+        n = max(np.size(value) for value in values.values())
+        if self.block is None:
+            self.block = {name: np.empty(self.blockSize, dtype=np.asarray(values[name]).dtype)
+                          for name in self.columns}
+        start = 0
+        while start < n:
+            count = min(n - start, self.blockSize - self.count)
+            for name in self.columns:
+                value = np.asarray(values[name])
+                self.block[name][self.count:self.count + count] = value[start:start + count] if value.ndim else value
+            self.count += count
+            start += count
+            if self.count == self.blockSize:
+                self.flush()
+        self.samples += n
+
+    def flush(self):
+        """ Writes the samples appended since the last flush as one chunk. """
+        if self.count:
+            for name in self.columns:
+                np.save(self.file, self.block[name][:self.count])
+            self.file.flush()
+            self.count = 0
+
+class BackgroundWriter(threading.Thread):
+    """ Writer stage on its own thread. put() only queues the data and never
+    blocks; the thread takes everything queued at once and hands it to write
+    in order. When the queue is full the data is dropped and counted instead
+    of stalling the caller. An exception stops the thread and is kept in
+    error.
+
+    Parameters
+    ----------
+    write : callable
+        called with every queued item, e.g. Recorder.append
+    flush : callable
+        called once after the last item, e.g. Recorder.flush
+    maxsize : int
+        items the queue holds before put() drops
+    """
+
+    def __init__(self, write, flush=None, maxsize=256):
+        threading.Thread.__init__(self, daemon=True)
+        self.write = write
+        self.flushWriter = flush
+        self.queue = queue.Queue(maxsize)
+        self.highWater = 0
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+
+    def put(self, item, samples=1):
+        """ Queues item, which holds samples samples.
+
+        Returns
+        -------
+        queued : bool
+            False if the item was dropped
+        """
+        if self.error is not None:
+            self.dropped += samples
+            return False
+        try:
+            self.queue.put_nowait((item, samples))
+        except queue.Full:
+            self.dropped += samples
+            return False
+        self.highWater = max(self.highWater, self.queue.qsize())
+        return True
+
+    def stop(self):
+        """ Writes everything still queued, then ends the thread. """
+        self.queue.put(None)
+        self.join()
+
+    def report(self):
+        return ("Writer: " + str(self.written) + " samples written, " + str(self.dropped) + " dropped, queue high-water "
+                + str(self.highWater) + " of " + str(self.queue.maxsize))
+
+    def run(self):
+        try:
+            while True:
+                batch = [self.queue.get()]
+                while batch[-1] is not None:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for entry in batch:
+                    if entry is None:
+                        if self.flushWriter is not None:
+                            self.flushWriter()
+                        return
+                    item, samples = entry
+                    self.write(item)
+                    self.written += samples
+        except Exception as e:
+            self.error = e
+            # Keep emptying the queue so stop() does not block
+            if None not in batch:
+                while self.queue.get() is not None:
+                    pass
+
+def iterRecording(fileName):
+    """ Reads a .npyc recording chunk by chunk, so a recording does not have
+    to fit in memory.
+
+    Yields
+    ------
+    columns : dict
+        array of every column of one chunk by name, in CSV column order
+    """
+    with open(fileName, 'rb') as file:
+        names = [str(name) for name in np.load(file)]
+        while True:
+            try:
+                chunk = [np.load(file) for name in names]
+            except (EOFError, ValueError):
+                # End of the file, or a chunk cut short
+                return
+            yield dict(zip(names, chunk))
+
+def readRecording(fileName):
+    """ Reads a .npyc recording.
+
+    Returns
+    -------
+    columns : dict
+        array of every column by name, in CSV column order, e.g. for
+        pandas.DataFrame(columns)
+    """
+    with open(fileName, 'rb') as file:
+        names = [str(name) for name in np.load(file)]
+    chunks = {name: [] for name in names}
+    for chunk in iterRecording(fileName):
+        for name in names:
+            chunks[name].append(chunk[name])
+    return {name: np.concatenate(chunks[name]) if chunks[name] else np.zeros(0) for name in names}
+
+def exportCSV(fileName, csvFileName=None):
+    """ Writes a .npyc recording as CSV with a header row of the column
+    names, formatted as the readout scripts used to write it.
+
+    Returns
+    -------
+    csvFileName : str
+        the CSV written
+    """
+    if csvFileName is None:
+        csvFileName = fileName[:-len(RECORDING_EXTENSION)] + '.csv'
+    columns = readRecording(fileName)
+    with open(csvFileName, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns.keys())
+        # astype(str) gives the shortest repr of each value and decodes STRING columns
+        writer.writerows(zip(*[column.astype(str) for column in columns.values()]))
+    return csvFileName
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python Recording.py <file>" + RECORDING_EXTENSION + " [<file>.csv]")
+        sys.exit(1)
+    print("Wrote " + exportCSV(*sys.argv[1:]))
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+PDF report of a stiffness run: one page per entry of a plot table, each the
+run plotted as y against x with a least-squares fit.
+
+The readout script and CSV_Data_Grapher used to repeat the same plot and
+np.polyfit block for every page and address the columns by position. Here
+the pages are rows of a table (Plot), all fits are solved together in one
+batched least-squares pass, and the pages are drawn one after the other
+into a single reused figure. The fits use every sample, but only up to
+MAX_POINTS of them are drawn, so large runs render quickly.
+
+With a process pool the pages of a report are rendered in parallel with the
+Agg backend, one figure per page that is closed as soon as it is saved, and
+merged into one PDF with pypdf; without pypdf the pages are rendered one
+after the other, with a warning. renderFiles() renders the reports of many
+runs in parallel, one run per process.
+
+Requirements
+------------
+numpy, matplotlib and pandas; pypdf (optional) for parallel page rendering:
+    pip install pypdf
+
+Usage
+-----
+    python Report.py <run or folder> ... [--workers N]
+renders the report of every run (CSV or .npyc, every CSV of a folder) next
+to it.
+"""
+
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import io
+import os
+import warnings
+import matplotlib
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from Recording import RECORDING_EXTENSION, readRecording
+
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+# One page of the report. yMargin and xMargin widen the axes by that fraction of the column's min and max, precision
+# is the number of decimals of the fit in the legend
+Plot = namedtuple('Plot', ['x', 'y', 'xlabel', 'ylabel', 'label', 'degree', 'xMargin', 'yMargin', 'precision'],
+                  defaults=[1, 0.0, 0.1, 4])
+
+# The pages of the stiffness reports
+STIFFNESS_PLOTS = [
+    Plot('Atto Avg. [uM]', 'loadCell [N]', "Attocube Avg. [um]", "Loadcell [N]", "Attocube Results",
+         yMargin=0.3, precision=1),
+    Plot('engAct [mm]', 'loadCell [N]', "Actuator [mm]", "Loadcell [N]", "Actuator Results"),
+    Plot('engMir [mm]', 'loadCell [N]', "Mirror [um]", "Loadcell [N]", "Mirror Results"),
+    Plot('BWY [mm]', 'loadCell [N]', "BWY [mm]", "Loadcell [N]", "BWY Results"),
+    Plot('AttoX [uM]', 'loadCell [N]', "Atto X Displacement [uM]", "Loadcell [N]", "Atto X"),
+    Plot('AttoY [uM]', 'loadCell [N]', "Atto Y Displacement [uM]", "Loadcell [N]", "Atto Y"),
+    Plot('AttoZ [uM]', 'loadCell [N]', "Atto Z Displacement [uM]", "Loadcell [N]", "Atto Z"),
+    Plot('AttoRotX [uRad]', 'loadCell [N]', "Atto X Rotation [uRad]", "Loadcell [N]", "Atto RotX"),
+    Plot('AttoRotY [uRad]', 'loadCell [N]', "Atto Y Rotation [uRad]", "Loadcell [N]", "Atto RotY"),
+    Plot('AttoRotZ [uRad]', 'loadCell [N]', "Atto Z Rotation [uRad]", "Loadcell [N]", "Atto RotZ"),
+    Plot('Setpoint [N]', 'SA LC [N]', "SA Setpoint [N]", "SA LC [N]", "SA LC"),
+    ]
+
+# Most samples drawn per page
+MAX_POINTS = 20000
+
+FIGURE_SIZE = (14.00, 7.00)
+
+def fitPlots(columns, plots):
+    """ Least-squares polynomial fits of all pages, solved together for the
+    pages of the same degree.
+
+    Parameters
+    ----------
+    columns : dict or pandas.DataFrame
+        the run's columns by name
+    plots : list
+        Plot of every page
+
+    Returns
+    -------
+    coefficients : list
+        polynomial coefficients of every page, highest power first as from
+        np.polyfit, None for the pages whose x is constant and has no fit
+    """
+    coefficients = [None] * len(plots)
+    for degree in set(plot.degree for plot in plots):
+        pages = [k for k, plot in enumerate(plots) if plot.degree == degree]
+        x = np.array([np.asarray(columns[plots[k].x], dtype=float) for k in pages])
+        y = np.array([np.asarray(columns[plots[k].y], dtype=float) for k in pages])
+        # Fit in x scaled to about [-1, 1] for the conditioning, then convert back
+        mean = x.mean(axis=1, keepdims=True)
+        std = x.std(axis=1, keepdims=True)
+        # A constant x, e.g. a channel that did not move, leaves the normal equations singular
+        moving = std[:, 0] > 0
+        pages = [k for k, fit in zip(pages, moving) if fit]
+        if not pages:
+            continue
+        x, y, mean, std = x[moving], y[moving], mean[moving], std[moving]
+        V = ((x - mean) / std)[..., None] ** np.arange(degree + 1)
+        VtV = np.einsum('kni,knj->kij', V, V)
+        Vty = np.einsum('kni,kn->ki', V, y)
+        scaled = np.linalg.solve(VtV, Vty[..., None])[..., 0]
+        for k, c, m, s in zip(pages, scaled, mean[:, 0], std[:, 0]):
+            polynomial = np.polynomial.Polynomial(c, domain=[m - s, m + s], window=[-1, 1]).convert()
+            coefficients[k] = np.pad(polynomial.coef, (0, degree + 1 - len(polynomial.coef)))[::-1]
+    return coefficients
+
+def fitLabel(coefficients, precision):
+    """ Legend text of a fit, e.g. 'y = 12.3456x -0.1234'. """
+    if len(coefficients) == 2:
+        return f'y = {coefficients[0]:.{precision}f}x {coefficients[1]:+.{precision}f}'
+    degree = len(coefficients) - 1
+    terms = [f'{c:+.{precision}f}x^{degree - k}' for k, c in enumerate(coefficients[:-2])]
+    terms += [f'{coefficients[-2]:+.{precision}f}x', f'{coefficients[-1]:+.{precision}f}']
+    return 'y = ' + ' '.join(terms).lstrip('+')
+
+def limits(values, margin):
+    low = np.min(values)
+    high = np.max(values)
+    if low == high:
+        return low - 1, high + 1
+    return low + margin * low, high + margin * high
+
+def drawPage(ax, columns, plot, coefficients, maxPoints=MAX_POINTS):
+    """ Draws one page into ax: the run (at most maxPoints samples of it, in
+    recording order) and its fit.
+    """
+    x = np.asarray(columns[plot.x], dtype=float)
+    y = np.asarray(columns[plot.y], dtype=float)
+    step = max(1, -(-len(x) // maxPoints))
+    ax.clear()
+    ax.plot(x[::step], y[::step], label=plot.label)
+    if coefficients is None:
+        ax.plot([], [], ' ', label='no fit, ' + plot.xlabel + ' is constant')
+    elif plot.degree == 1:
+        ax.axline(xy1=(0, coefficients[1]), slope=coefficients[0], color="red",
+                  label=fitLabel(coefficients, plot.precision))
+    else:
+        curve = np.linspace(np.min(x), np.max(x), 200)
+        ax.plot(curve, np.polyval(coefficients, curve), color="red", label=fitLabel(coefficients, plot.precision))
+    ax.set_xlim(*limits(x, plot.xMargin))
+    ax.set_ylim(*limits(y, plot.yMargin))
+    ax.set_xlabel(plot.xlabel)
+    ax.set_ylabel(plot.ylabel)
+    ax.legend()
+
+def useAgg():
+    """ Process pool initializer: render without a display. """
+    matplotlib.use('Agg')
+
+def renderPage(x, y, plot, coefficients, maxPoints=MAX_POINTS):
+    """ Renders one page in its own figure.
+
+    Returns
+    -------
+    page : bytes
+        single page PDF
+    """
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE, layout='tight')
+    drawPage(ax, {plot.x: x, plot.y: y}, plot, coefficients, maxPoints)
+    page = io.BytesIO()
+    fig.savefig(page, format='pdf')
+    plt.close(fig)
+    return page.getvalue()
+
+def renderReport(columns, fileName, plots=STIFFNESS_PLOTS, maxPoints=MAX_POINTS, pool=None):
+    """ Writes the report of a run as a multi-page PDF.
+
+    Parameters
+    ----------
+    columns : dict or pandas.DataFrame
+        the run's columns by name
+    fileName : str
+        PDF to write
+    plots : list
+        Plot of every page
+    pool : concurrent.futures.ProcessPoolExecutor
+        renders the pages in parallel if given and pypdf is installed,
+        initialized with useAgg()
+
+    Returns
+    -------
+    coefficients : list
+        the fit of every page, as from fitPlots()
+    """
+    coefficients = fitPlots(columns, plots)
+    if pool is not None and PdfWriter is not None:
+        # Only the two columns of a page go to its worker; pages are merged in order as they finish
+        pages = pool.map(renderPage, [np.asarray(columns[plot.x]) for plot in plots],
+                         [np.asarray(columns[plot.y]) for plot in plots], plots, coefficients,
+                         [maxPoints] * len(plots))
+        writer = PdfWriter()
+        for page in pages:
+            writer.append(io.BytesIO(page))
+        with open(fileName, 'wb') as file:
+            writer.write(file)
+        return coefficients
+    if pool is not None:
+        warnings.warn("pypdf is not installed, rendering " + fileName + " one page at a time", RuntimeWarning)
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE, layout='tight')
+    with PdfPages(fileName) as pdf:
+        for plot, fit in zip(plots, coefficients):
+            drawPage(ax, columns, plot, fit, maxPoints)
+            fig.savefig(pdf, format='pdf')
+    plt.close(fig)
+    return coefficients
+
+def readRun(fileName, plots=STIFFNESS_PLOTS):
+    """ Columns of a recorded run (CSV or .npyc) that the plots need. """
+    names = sorted(set(name for plot in plots for name in (plot.x, plot.y)))
+    if fileName.endswith(RECORDING_EXTENSION):
+        columns = readRecording(fileName)
+        return {name: columns[name] for name in names}
+    import pandas as pd
+    return pd.read_csv(fileName, usecols=names)
+
+def reportName(fileName):
+    """ PDF of a run, next to it with the same name. """
+    return os.path.splitext(fileName)[0] + ".pdf"
+
+def renderFile(fileName, plots=STIFFNESS_PLOTS, maxPoints=MAX_POINTS):
+    """ Renders the report of one run next to it.
+
+    Returns
+    -------
+    pdfFileName : str
+    """
+    pdfFileName = reportName(fileName)
+    renderReport(readRun(fileName, plots), pdfFileName, plots, maxPoints)
+    return pdfFileName
+
+def findRuns(paths):
+    """ Runs named by paths: files, wildcards, or folders for every CSV and
+    .npyc in them.
+    """
+    fileNames = []
+    for path in paths:
+        if os.path.isdir(path):
+            fileNames += glob.glob(os.path.join(path, '*.csv'))
+            fileNames += glob.glob(os.path.join(path, '*' + RECORDING_EXTENSION))
+        else:
+            fileNames += glob.glob(path) or [path]
+    # A run recorded as .npyc with its exported CSV is rendered once, from the CSV
+    csvs = set(fileNames)
+    return sorted(fileName for fileName in csvs if not (fileName.endswith(RECORDING_EXTENSION)
+                                                       and fileName[:-len(RECORDING_EXTENSION)] + '.csv' in csvs))
+
+def renderFiles(fileNames, workers=None, plots=STIFFNESS_PLOTS):
+    """ Renders the reports of many runs in parallel, one run per process.
+
+    Returns
+    -------
+    results : list
+        (fileName, pdfFileName or the exception that stopped it)
+    """
+    if not fileNames:
+        return []
+    results = []
+    with ProcessPoolExecutor(workers, initializer=useAgg) as pool:
+        futures = [(fileName, pool.submit(renderFile, fileName, plots)) for fileName in fileNames]
+        for fileName, future in futures:
+            try:
+                results.append((fileName, future.result()))
+            except Exception as e:
+                results.append((fileName, e))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Renders the PDF report of recorded stiffness runs.")
+    parser.add_argument('runs', nargs='+', help="CSV or " + RECORDING_EXTENSION + " runs or folders, wildcards allowed")
+    parser.add_argument('--workers', type=int, default=None, help="processes, default one per CPU")
+    args = parser.parse_args()
+
+    fileNames = findRuns(args.runs)
+    if len(fileNames) == 1:
+        # A single run renders its pages in parallel instead
+        with ProcessPoolExecutor(args.workers, initializer=useAgg) as pool:
+            renderReport(readRun(fileNames[0]), reportName(fileNames[0]), pool=pool)
+        print("Wrote " + reportName(fileNames[0]))
+    else:
+        for fileName, result in renderFiles(fileNames, args.workers):
+            print(("Wrote " + result) if isinstance(result, str) else ("Failed " + fileName + ": " + str(result)))
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Stiffness of the hardpoint, loadCell [N] against the displacement channels.
+
+StreamingRegression keeps running means and co-moments of the load and of
+every channel, so the line fit is updated as the samples arrive instead of
+running np.polyfit on the reloaded CSV after the test. Blocks of samples are
+merged in with the pairwise update of Chan et al., which costs O(1) per
+sample and stays accurate for long runs with large offsets. The current fit
+is published to the PLC (MAIN.PyStiffSlope, MAIN.PyStiffIntercept,
+MAIN.PyStiffR2) for the HMI.
+
+After the test, segmentCycles() splits the run into the load cycles of
+fbSTIFF and cycleMetrics() works out the stiffness of every cycle and
+branch, the hysteresis loop areas and the cycle to cycle repeatability.
+"""
+
+import numpy as np
+import pyads
+
+# Channels the load is fitted against, in the order of the MAIN.PyStiff* arrays
+STIFFNESS_FIELDS = ['Atto Avg. [uM]', 'engAct [mm]', 'engMir [mm]', 'BWY [mm]',
+                    'AttoX [uM]', 'AttoY [uM]', 'AttoZ [uM]', 'AttoRotX [uRad]', 'AttoRotY [uRad]', 'AttoRotZ [uRad]']
+
+LOAD_FIELD = 'loadCell [N]'
+
+class StreamingRegression(object):
+    """ Running least-squares line y = slope * x + intercept of one y against
+    several x channels.
+
+    Parameters
+    ----------
+    channels : int
+        number of x channels
+    """
+
+    def __init__(self, channels=len(STIFFNESS_FIELDS)):
+        self.count = 0
+        self.meanX = np.zeros(channels)
+        self.meanY = 0.0
+        self.Sxx = np.zeros(channels)
+        self.Sxy = np.zeros(channels)
+        self.Syy = 0.0
+
+    def update(self, x, y):
+        """ Adds a block of samples.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            channels, shape (n, channels)
+        y : numpy.ndarray
+            shape (n,)
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n = len(y)
+        if n == 0:
+            return
+        meanX = x.mean(axis=0)
+        meanY = y.mean()
+        dx = x - meanX
+        dy = y - meanY
+        total = self.count + n
+        deltaX = meanX - self.meanX
+        deltaY = meanY - self.meanY
+        weight = self.count * n / total
+        self.Sxx += np.einsum('ij,ij->j', dx, dx) + deltaX * deltaX * weight
+        self.Sxy += dy @ dx + deltaX * deltaY * weight
+        self.Syy += dy @ dy + deltaY * deltaY * weight
+        self.meanX += deltaX * n / total
+        self.meanY += deltaY * n / total
+        self.count = total
+
+    def fit(self):
+        """ Current fit.
+
+        Returns
+        -------
+        slope : numpy.ndarray
+            per channel, nan while a channel has not moved
+        intercept : numpy.ndarray
+            per channel
+        r2 : numpy.ndarray
+            coefficient of determination per channel
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(self.Sxx > 0, self.Sxy / self.Sxx, np.nan)
+            r2 = np.where((self.Sxx > 0) & (self.Syy > 0), self.Sxy * self.Sxy / (self.Sxx * self.Syy), np.nan)
+        return slope, self.meanY - slope * self.meanX, r2
+
+    def publish(self, plc, prefix='MAIN.PyStiff', fit=None):
+        """ Writes a fit to the PLC arrays prefix + 'Slope', 'Intercept' and
+        'R2'; channels without a fit are written as 0. fit is as returned
+        by fit(), e.g. taken on another thread, the current one if None.
+        """
+        arrayType = pyads.PLCTYPE_LREAL * len(self.Sxx)
+        for name, values in zip(('Slope', 'Intercept', 'R2'), fit if fit is not None else self.fit()):
+            plc.write_by_name(prefix + name, np.nan_to_num(values).tolist(), arrayType)
+
+#-----------------------------------------------------------------------------------------------#
+
+def segmentCycles(load, window=25, minSpan=0.2, floor=1.0, noiseSpan=10.0):
+    """ Splits a stiffness test into its load cycles at the sign changes of
+    the load-cell derivative.
+
+    Parameters
+    ----------
+    load : numpy.ndarray
+        loadCell [N] of every sample
+    window : int
+        samples of the moving average taken before differentiating
+    minSpan : float
+        branches whose load span is less than this fraction of the whole
+        run's span are noise and joined to the branch before them
+    floor : float
+        smallest load span in N of a branch, whatever the run's span
+    noiseSpan : float
+        smallest load span of a branch in standard deviations of the load
+        about its moving average, so a flat load gives no cycles
+
+    Returns
+    -------
+    cycles : numpy.ndarray
+        shape (m, 3): first sample of the loading branch, first sample of
+        the unloading branch and the sample after it, of every complete
+        load/unload cycle
+    """
+    load = np.asarray(load, dtype=float)
+    n = len(load)
+    window = max(1, min(window, n // 4))
+    if n < 2 * window + 2:
+        return np.zeros((0, 3), dtype=int)
+    summed = np.cumsum(np.insert(load, 0, 0.0))
+    smooth = (summed[window:] - summed[:-window]) / window
+    direction = np.sign(np.diff(smooth))
+    # Flat stretches keep the direction before them
+    index = np.maximum.accumulate(np.where(direction != 0, np.arange(len(direction)), 0))
+    direction = direction[index]
+
+    # Noise of the load about its moving average, from the median absolute deviation
+    residual = load[window // 2:window // 2 + len(smooth)] - smooth
+    noise = 1.4826 * np.median(np.abs(residual - np.median(residual)))
+    span = max(minSpan * np.ptp(load), floor, noiseSpan * noise)
+    if np.ptp(load) < span:
+        return np.zeros((0, 3), dtype=int)
+    while True:
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(direction)) + 1))
+        # Branch boundaries in samples of load, shifted by half the averaging window
+        bounds = np.concatenate((starts + window // 2, [n]))
+        bounds[0] = 0
+        spans = np.maximum.reduceat(load, bounds[:-1]) - np.minimum.reduceat(load, bounds[:-1])
+        small = np.flatnonzero(spans[1:] < span) + 1
+        if len(small) == 0:
+            break
+        # Join the smallest noise branch to the one before it and look again
+        worst = small[np.argmin(spans[small])]
+        stop = starts[worst + 1] if worst + 1 < len(starts) else len(direction)
+        direction[starts[worst]:stop] = direction[starts[worst] - 1]
+
+    rising = direction[starts] > 0
+    pairs = np.flatnonzero(rising[:-1] & ~rising[1:])
+    return np.column_stack((bounds[pairs], bounds[pairs + 1], bounds[pairs + 2]))
+
+def cycleMetrics(x, load, cycles):
+    """ Stiffness and hysteresis of every cycle, for all channels at once.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        displacement channels, shape (n, channels)
+    load : numpy.ndarray
+        loadCell [N], shape (n,)
+    cycles : numpy.ndarray
+        as returned by segmentCycles()
+
+    Returns
+    -------
+    metrics : dict
+        'stiffness', 'loadStiffness', 'unloadStiffness': slope of the load
+        against each channel over the whole cycle and over each branch,
+        shape (m, channels);
+        'hysteresis': area of the load/displacement loop of each cycle in
+        N times the channel unit, shape (m, channels);
+        'repeatability': standard deviation of the cycle stiffness,
+        shape (channels,);
+        'relativeRepeatability': the same relative to the mean stiffness
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(load, dtype=float)
+    # Centred, so the prefix sums keep their precision over long runs
+    x = x - x.mean(axis=0)
+    y = y - y.mean()
+    zero = np.zeros((1, x.shape[1]))
+    Sx = np.concatenate((zero, np.cumsum(x, axis=0)))
+    Sxx = np.concatenate((zero, np.cumsum(x * x, axis=0)))
+    Sxy = np.concatenate((zero, np.cumsum(x * y[:, None], axis=0)))
+    Sy = np.concatenate(([0.0], np.cumsum(y)))[:, None]
+
+    def slope(start, stop):
+        n = (stop - start)[:, None]
+        sx = Sx[stop] - Sx[start]
+        sy = Sy[stop] - Sy[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (n * (Sxy[stop] - Sxy[start]) - sx * sy) / (n * (Sxx[stop] - Sxx[start]) - sx * sx)
+
+    start, turn, stop = cycles[:, 0], cycles[:, 1], cycles[:, 2]
+    # Trapezoids of the loop, closed from the last sample of the cycle back to its first
+    steps = np.concatenate((zero, np.cumsum(np.diff(x, axis=0) * (y[1:] + y[:-1])[:, None] / 2, axis=0)))
+    last = stop - 1
+    closing = (x[start] - x[last]) * (y[start] + y[last])[:, None] / 2
+    hysteresis = np.abs(steps[last] - steps[start] + closing)
+
+    stiffness = slope(start, stop)
+    mean = stiffness.mean(axis=0) if len(cycles) else np.full(x.shape[1], np.nan)
+    repeatability = stiffness.std(axis=0) if len(cycles) else np.full(x.shape[1], np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = repeatability / np.abs(mean)
+    return {'stiffness': stiffness, 'loadStiffness': slope(start, turn), 'unloadStiffness': slope(turn, stop),
+            'hysteresis': hysteresis, 'repeatability': repeatability, 'relativeRepeatability': relative}
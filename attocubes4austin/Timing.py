@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in timing of the stages of an acquisition loop (PLC reads and writes,
+each IDS request, the pose transform, the file writes), to see which device
+or stage limits the sample rate on a given day.
+
+Every stage keeps a log-linear Histogram of its durations in the manner of
+HdrHistogram: durations below 2**BITS ns are counted exactly, larger ones in
+buckets of 2**(BITS-1) steps per power of two, so any duration is known to
+better than 1 % and adding one costs a few integer operations. StageTimer
+holds the histograms of a run and dumps them as JSON next to the data file.
+
+A disabled StageTimer records nothing: record() returns at once and wrap()
+hands back the function unchanged, so the scripts can leave the calls in.
+Each stage should be recorded from one thread only.
+"""
+
+import json
+from time import perf_counter_ns
+import numpy as np
+
+# Bits of precision of the histogram buckets
+BITS = 8
+
+# Longest duration counted in its own bucket, 2**40 ns is about 18 minutes
+HIGHEST_BITS = 40
+
+PERCENTILES = [50, 90, 99, 99.9, 99.99]
+
+class Histogram(object):
+    """ Log-linear histogram of durations in ns. """
+
+    def __init__(self):
+        self.size = 1 << BITS
+        self.half = self.size >> 1
+        self.counts = np.zeros(self.size + (HIGHEST_BITS - BITS) * self.half, dtype=np.int64)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def index(self, value):
+        if value < self.size:
+            return value
+        shift = value.bit_length() - BITS
+        return min(self.size + (shift - 1) * self.half + (value >> shift) - self.half, len(self.counts) - 1)
+
+    def lowest(self, index):
+        """ Smallest duration counted in the bucket index, and the bucket width. """
+        index = np.asarray(index)
+        shift = np.maximum(index - self.size, 0) // self.half + 1
+        value = ((index - self.size) % self.half + self.half) << shift
+        return np.where(index < self.size, index, value), np.where(index < self.size, 1, 1 << shift)
+
+    def add(self, value):
+        """ Counts one duration in ns. """
+        self.counts[self.index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """ Durations in ns below which the given percentages of the counts
+        fall, each the middle of its bucket.
+        """
+        if not self.count:
+            return [None] * len(percentiles)
+        cumulative = np.cumsum(self.counts)
+        index = np.searchsorted(cumulative, np.asarray(percentiles) / 100 * self.count)
+        lowest, width = self.lowest(np.minimum(index, len(self.counts) - 1))
+        return np.minimum(lowest + width // 2, self.max).tolist()
+
+    def describe(self):
+        """ Summary in us and the non-empty buckets, as stored by StageTimer.dump(). """
+        buckets = np.flatnonzero(self.counts)
+        lowest, width = self.lowest(buckets)
+        return {'count': self.count,
+                'minUs': self.min / 1e3 if self.min is not None else None,
+                'meanUs': self.total / self.count / 1e3 if self.count else None,
+                'maxUs': self.max / 1e3,
+                'percentilesUs': {'p' + str(p): (v / 1e3 if v is not None else None)
+                                  for p, v in zip(PERCENTILES, self.percentiles())},
+                'buckets': [[int(low), int(count)] for low, count in zip(lowest, self.counts[buckets])]}
+
+class StageTimer(object):
+    """ Histograms of the stage durations of one run.
+
+    Parameters
+    ----------
+    enabled : bool
+        False records nothing
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+
+    def histogram(self, stage):
+        if stage not in self.histograms:
+            self.histograms[stage] = Histogram()
+        return self.histograms[stage]
+
+    def record(self, stage, start):
+        """ Counts the time from start, a perf_counter_ns() value, to now. """
+        if self.enabled:
+            self.histogram(stage).add(perf_counter_ns() - start)
+
+    def wrap(self, stage, function):
+        """ function, timed as stage on every call if enabled. """
+        if not self.enabled:
+            return function
+        histogram = self.histogram(stage)
+
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            result = function(*args, **kwargs)
+            histogram.add(perf_counter_ns() - start)
+            return result
+        return timed
+
+    def report(self):
+        """ One line per stage: count and mean, median, p99 and max in us. """
+        lines = []
+        for stage, histogram in self.histograms.items():
+            if histogram.count:
+                median, p99 = histogram.percentiles([50, 99])
+                lines.append('%-24s %9d x  mean %10.1f  p50 %10.1f  p99 %10.1f  max %10.1f us'
+                             % (stage, histogram.count, histogram.total / histogram.count / 1e3, median / 1e3,
+                                p99 / 1e3, histogram.max / 1e3))
+        return '\n'.join(lines)
+
+    def dump(self, fileName):
+        """ Writes every stage's histogram to a JSON file, e.g. next to the
+        run's data file. Does nothing if disabled.
+        """
+        if not self.enabled:
+            return
+        with open(fileName, 'w') as file:
+            json.dump({'bits': BITS, 'stages': {stage: histogram.describe()
+                                                for stage, histogram in self.histograms.items()}}, file, indent=4)
@@ -2,33 +2,34 @@ import pickle
 import time
 import pandas as pd
 
-from IDS import Device
-
-dev = Device('192.168.88.207')
-dev.connect()
-
-print(dev.getFeatureName(1)) #OK
-print(dev.getSerialNumber()) #OK
-print(dev.getFpgaVersion()) #OK
-print(dev.getMacAddress()) #OK
-print(dev.getDeviceType()) #OK
-print(dev.getDeviceName()) #OK
-
-print("Starting: ", dev.startMeasurement()) #OK
-
-t0 = time.monotonic()
-
-data = []
-while time.monotonic() - t0 < 60:
-    data.append([time.monotonic() - t0, dev.getAxisDisplacement(0), dev.getAxisDisplacement(1)])
-
-with open ("test.bin", "wb") as f:
-    pickle.dump(data, f)
-    
-with open("test.bin", "rb") as g:
-    object = pickle.load(g)
-    
-f = pd.DataFrame(object)
-f.to_csv('r_file.csv')
-print("Stopping...")
-dev.close()
+from Acquisition import connectIDS, readDisplacements
+
+def acquire(dev, duration=60):
+
+    # Read the first two axes of dev as fast as it answers for duration seconds; one row of seconds and displacements
+    # per reading
+    t0 = time.monotonic()
+
+    data = []
+    while time.monotonic() - t0 < duration:
+        data.append([time.monotonic() - t0] + readDisplacements([dev])[:2].tolist())
+    return data
+
+if __name__ == '__main__':
+
+    dev = connectIDS('192.168.88.207', '207')
+
+    print("Starting: ", dev.startMeasurement()) #OK
+
+    data = acquire(dev)
+
+    with open ("test.bin", "wb") as f:
+        pickle.dump(data, f)
+
+    with open("test.bin", "rb") as g:
+        object = pickle.load(g)
+
+    f = pd.DataFrame(object)
+    f.to_csv('r_file.csv')
+    print("Stopping...")
+    dev.close()
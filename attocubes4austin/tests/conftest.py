@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of attocubes4austin import each other by name, as when run from that folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,31 @@
+import pytest
+from ACS import AttoException
+from IDS import Device
+from IDSSimulator import Simulator
+
+@pytest.fixture
+def device():
+    simulator = Simulator(port=0, noise=0.0, seed=0)
+    simulator.start()
+    dev = Device('127.0.0.1')
+    dev.TCP_PORT = simulator.port
+    dev.connect()
+    yield dev
+    dev.close()
+    simulator.stop()
+
+def test_request_with_pipelined_requests_pending(device):
+    ids = device.sendAxisDisplacementRequests()
+    # Replies of the pending requests arrive first and must not be taken for this one
+    response = device.request('com.attocube.system.getSerialNumber')
+    assert response['id'] not in ids
+    assert response['result'] == ['IDS-SIM']
+    displacements = device.readAxisDisplacements(ids)
+    assert len(displacements) == 3
+
+def test_request_raises_on_error_without_id(device):
+    # A request the device cannot read is answered with an error that has no id
+    device.bufferedSocket.write('{"jsonrpc": "2.0"}')
+    device.bufferedSocket.flush()
+    with pytest.raises(AttoException):
+        device.request('com.attocube.system.getSerialNumber')
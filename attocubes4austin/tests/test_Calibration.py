@@ -0,0 +1,18 @@
+import numpy as np
+from Calibration import CalibrationStore, DEFAULT_J, DEFAULT_NAME
+
+def test_load_default_does_not_write(tmp_path):
+    store = CalibrationStore(str(tmp_path / 'Calibrations'))
+    calibration = store.load('HP1', ['206', '207'])
+    assert calibration.name == DEFAULT_NAME
+    assert np.array_equal(calibration.J, DEFAULT_J)
+    assert not (tmp_path / 'Calibrations').exists()
+
+def test_load_saved(tmp_path):
+    store = CalibrationStore(str(tmp_path))
+    J = DEFAULT_J * 2
+    store.save('HP1', ['206', '207'], J, source='test')
+    calibration = store.load('HP1', ['206', '207'])
+    assert calibration.name == store.key('HP1', ['206', '207'])
+    assert np.array_equal(calibration.J, J)
+    assert store.names() == [calibration.name]
@@ -0,0 +1,26 @@
+from time import monotonic
+import pytest
+from IDS import Device
+from IDSSimulator import Simulator
+
+LATENCY = 0.05
+
+@pytest.fixture
+def device():
+    simulator = Simulator(port=0, noise=0.0, latency=LATENCY, seed=0)
+    simulator.start()
+    dev = Device('127.0.0.1')
+    dev.TCP_PORT = simulator.port
+    dev.connect()
+    yield dev
+    dev.close()
+    simulator.stop()
+
+def test_pipelined_requests_overlap_their_latency(device):
+    start = monotonic()
+    ids = [device.sendRequest('com.attocube.ids.displacement.getAxesDisplacement') for k in range(10)]
+    responses = [device.getResponse(request_id) for request_id in ids]
+    elapsed = monotonic() - start
+    assert [response['id'] for response in responses] == ids
+    # Ten requests in flight together take about one latency, not ten
+    assert LATENCY <= elapsed < 5 * LATENCY
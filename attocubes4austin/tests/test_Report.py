@@ -0,0 +1,31 @@
+import pytest
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import Report
+from Report import fitPlots, renderReport, Plot
+
+PLOTS = [Plot('x', 'y', "x", "y", "Linear"), Plot('flat', 'y', "Flat", "y", "Flat"),
+         Plot('x', 'y', "x", "y", "Quadratic", degree=2), Plot('flat', 'y', "Flat", "y", "Flat", degree=2)]
+
+def columns():
+    x = np.linspace(-5.0, 5.0, 101)
+    return {'x': x, 'y': 0.5 * x * x + 2.0 * x - 1.0, 'flat': np.full(101, 3.0)}
+
+def test_fitPlots_constant_column():
+    coefficients = fitPlots(columns(), PLOTS)
+    assert coefficients[1] is None and coefficients[3] is None
+    assert np.allclose(coefficients[0], np.polyfit(columns()['x'], columns()['y'], 1))
+    assert np.allclose(coefficients[2], [0.5, 2.0, -1.0])
+
+def test_renderReport_constant_column(tmp_path):
+    fileName = str(tmp_path / 'report.pdf')
+    coefficients = renderReport(columns(), fileName, PLOTS)
+    assert coefficients[1] is None
+    assert (tmp_path / 'report.pdf').stat().st_size > 0
+
+def test_renderReport_warns_without_pypdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(Report, 'PdfWriter', None)
+    with pytest.warns(RuntimeWarning, match="pypdf"):
+        renderReport(columns(), str(tmp_path / 'report.pdf'), PLOTS, pool=object())
+    assert (tmp_path / 'report.pdf').stat().st_size > 0
@@ -0,0 +1,20 @@
+import numpy as np
+from Stiffness import segmentCycles
+
+def triangle(cycles, quarter=500, peak=450.0):
+    ramp = np.arange(quarter) / quarter
+    cycle = np.concatenate((ramp, 1 - ramp, -ramp, ramp - 1))
+    return peak * np.tile(cycle, cycles)
+
+def test_segmentCycles_noisy_triangle():
+    rng = np.random.default_rng(0)
+    load = triangle(3) + rng.normal(0.0, 2.0, 6000)
+    cycles = segmentCycles(load)
+    assert len(cycles) == 3
+    assert np.all(np.abs(load[cycles[:, 1]]) > 400)
+
+def test_segmentCycles_flat_load():
+    rng = np.random.default_rng(0)
+    assert segmentCycles(rng.normal(0.0, 0.2, 20000)).shape == (0, 3)
+    assert segmentCycles(5.0 + rng.normal(0.0, 20.0, 20000)).shape == (0, 3)
+    assert segmentCycles(np.zeros(1000)).shape == (0, 3)